@@ -1,13 +1,27 @@
 import os
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+import cProfile
+import time
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, g, Response
 from datetime import datetime, timedelta
+from sqlalchemy import select, or_, and_
 from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, Timetable
+from models import db, User, Timetable, ensure_columns, ensure_indexes
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from scheduler import create_timetable
+from scheduler import create_timetable, iter_timetable, InfeasibleTimetable
 import traceback
-from train_model import train_and_save
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
 from models import SessionHistory
+from model_registry import registry
+from timetable_cache import timetable_cache
+from timetable_codec import pack_for_storage, decode_timetable
+from training_worker import TrainingWorker, run_training
+from session_writer import SessionWriter
+from variant_pool import generate_variants, MAX_VARIANTS
+from metrics import metrics, span
+from cohort import run_cohort, COHORT_MAX_STUDENTS
+from compaction import maybe_compact
+from replan import NoPlanState, plan_state, reschedule_saved
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
@@ -25,11 +39,32 @@ DB_HOST = os.environ.get("DB_HOST", "localhost")
 DB_PORT = os.environ.get("DB_PORT", "3306")
 DB_NAME = os.environ.get("DB_NAME", "studyplanner")
 
-if os.environ.get("USE_MYSQL"):
+if os.environ.get("DATABASE_URL"):
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ["DATABASE_URL"]
+elif os.environ.get("USE_MYSQL"):
     app.config["SQLALCHEMY_DATABASE_URI"] = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 else:
     app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///studyplanner.db"
+if app.config["SQLALCHEMY_DATABASE_URI"].startswith("mysql"):
+    # Recycle below MySQL's wait_timeout and ping on checkout so idle
+    # connections dropped by the server are replaced instead of erroring.
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": True,
+    }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+DASHBOARD_PAGE_SIZE = int(os.environ.get("DASHBOARD_PAGE_SIZE", 20))
+# Requests slower than this many ms get a cProfile dump in PROFILE_DIR; 0 disables profiling.
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+# Streamed plans hand their sessions to the writer this many days at a time.
+STREAM_FLUSH_DAYS = int(os.environ.get("STREAM_FLUSH_DAYS", 28))
+# Bearer token for /api/cohort, which writes plans for other users; unset disables it.
+COHORT_TOKEN = os.environ.get("COHORT_TOKEN")
 
 db.init_app(app)
 
@@ -43,77 +78,91 @@ def load_user(user_id):
 
 with app.app_context():
     db.create_all()
+    ensure_columns()
+    ensure_indexes()
 
-def record_generated_timetable_as_sessions(user, timetable: dict, subjects_meta: list):
+def warm_up():
+    """
+    Load the global model before the first request. A pre-forking server
+    calls this in the master so every worker shares the arrays copy-on-write.
+    """
+    with span("model_load", path="warm_up"):
+        registry.get()
 
-    try:
-    
-        meta_by_name = {}
-        for s in subjects_meta:
-            name = str(s.get("name","")).strip()
-            if not name:
-                continue
-            meta_by_name[name] = {
-                "difficulty": int(s.get("difficulty") or 3),
-                "importance": int(s.get("importance") or 3),
-                "syllabus_size": float(s.get("syllabus_size") or 1.0),
-                "deadline": s.get("deadline"),
-                "task_type": s.get("task_type") or "Other"
-            }
-
-        rows = []
-    
-        for date_str, slots in timetable.items():
-        
-            try:
-                day_date = datetime.fromisoformat(date_str).date()
-            except Exception:
-                try:
-                    day_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                except Exception:
-                    day_date = None
-
-            for slot in slots:
-                subj_name = slot.get("subject")
-                hours = float(slot.get("hours", 0.0) or 0.0)
-                if hours <= 0:
-                    continue
-                meta = meta_by_name.get(subj_name, {})
-        
-                days_to_deadline = None
-                if meta.get("deadline") and day_date:
-                    try:
-                        dl = datetime.fromisoformat(meta["deadline"]).date()
-                    except Exception:
-                        try:
-                            dl = datetime.strptime(meta["deadline"], "%Y-%m-%d").date()
-                        except Exception:
-                            dl = None
-                    if dl:
-                        days_to_deadline = max(0, (dl - day_date).days)
-
-                sh = SessionHistory(
-                    user_id = user.id if hasattr(user, "id") else user,
-                    subject = subj_name,
-                    actual_hours = hours,
-                    difficulty = meta.get("difficulty"),
-                    importance = meta.get("importance"),
-                    syllabus_size = meta.get("syllabus_size"),
-                    days_to_deadline = days_to_deadline,
-                    task_type = meta.get("task_type")
-                )
-                rows.append(sh)
-
-        if rows:
-            db.session.bulk_save_objects(rows)
-            db.session.commit()
-            return True, len(rows)
-        return False, 0
-    except Exception as e:
-        db.session.rollback()
-        app.logger.error("Failed to record generated timetable sessions: %s", e)
-        app.logger.error(traceback.format_exc())
-        return False, 0
+def _background_training(a, user_id):
+    """Training worker pass: compact old generated sessions now and then, then train."""
+    if user_id is None:
+        try:
+            maybe_compact(a)
+        except Exception as e:
+            a.logger.error("Session compaction failed: %s", e)
+            a.logger.error(traceback.format_exc())
+    return run_training(a, incremental=True, user_id=user_id)
+
+training_worker = TrainingWorker(
+    app,
+    debounce_seconds=float(os.environ.get("TRAINING_DEBOUNCE_SECONDS", 5)),
+    max_wait_seconds=float(os.environ.get("TRAINING_MAX_WAIT_SECONDS", 60)),
+    train_fn=_background_training
+)
+
+def _request_training(user_ids):
+    for user_id in user_ids:
+        training_worker.request(user_id)
+
+session_writer = SessionWriter(app, on_written=_request_training)
+
+
+def _numeric_stats(stats_fn):
+    return lambda: {(("stat", k),): v for k, v in stats_fn().items()
+                    if isinstance(v, (int, float))}
+
+metrics.gauge("model_registry", "Model registry counters and sizes.", _numeric_stats(registry.stats))
+metrics.gauge("timetable_cache", "Timetable cache counters and sizes.", _numeric_stats(timetable_cache.stats))
+metrics.gauge("training_worker", "Background training worker state.", _numeric_stats(training_worker.status))
+metrics.gauge("session_writer", "Background session writer state.", _numeric_stats(session_writer.status))
+
+http_requests = metrics.counter("http_requests_total", "HTTP requests by endpoint, method and status.")
+http_request_seconds = metrics.histogram("http_request_seconds", "HTTP request latency by endpoint.")
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_SLOW_MS > 0:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Only one profiler can be active at a time on Python 3.12+;
+            # concurrent requests go unprofiled.
+            return
+        g.profiler = profiler
+
+
+@app.after_request
+def _record_request(response):
+    elapsed = time.perf_counter() - g.get("request_started", time.perf_counter())
+    endpoint = request.endpoint or "unmatched"
+    http_request_seconds.observe(elapsed, endpoint=endpoint, method=request.method)
+    http_requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        if elapsed * 1000 >= PROFILE_SLOW_MS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{endpoint}.prof")
+            profiler.dump_stats(path)
+            app.logger.warning("Slow request %s %s took %.0f ms; profile written to %s",
+                               request.method, request.path, elapsed * 1000, path)
+    return response
+
+
+@app.teardown_request
+def _stop_profiler(exc):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
 
 
 @app.route("/")
@@ -123,18 +172,47 @@ def root():
     return redirect("/login")
 
 
+def _timetable_page(user_id, cursor=None, limit=DASHBOARD_PAGE_SIZE):
+    """
+    One page of a user's saved timetables, newest first, without the data
+    column. cursor is the "<created_at>_<id>" of the last item already shown.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    stmt = (select(Timetable.id, Timetable.title, Timetable.created_at)
+            .where(Timetable.user_id == user_id)
+            .order_by(Timetable.created_at.desc(), Timetable.id.desc())
+            .limit(limit + 1))
+    if cursor:
+        created_str, _, id_str = cursor.rpartition("_")
+        created_at, last_id = datetime.fromisoformat(created_str), int(id_str)
+        stmt = stmt.where(or_(Timetable.created_at < created_at,
+                              and_(Timetable.created_at == created_at, Timetable.id < last_id)))
+    rows = db.session.execute(stmt).all()
+    items = [{
+        "id": r.id,
+        "title": r.title or f"Timetable #{r.id}",
+        "created_at": r.created_at.isoformat(),
+    } for r in rows[:limit]]
+    next_cursor = f"{items[-1]['created_at']}_{items[-1]['id']}" if len(rows) > limit else None
+    return items, next_cursor
+
+
 @app.route("/dashboard")
 @login_required
 def dashboard():
-    tts = Timetable.query.filter_by(user_id=current_user.id).order_by(Timetable.created_at.desc()).all()
-    items = []
-    for t in tts:
-        items.append({
-            "id": t.id,
-            "title": t.title or f"Timetable #{t.id}",
-            "created_at": t.created_at.isoformat(),
-        })
-    return render_template("dashboard.html", timetables=items, name=current_user.name)
+    items, next_cursor = _timetable_page(current_user.id)
+    return render_template("dashboard.html", timetables=items, next_cursor=next_cursor, name=current_user.name)
+
+
+@app.route("/api/timetables")
+@login_required
+def api_timetables():
+    try:
+        limit = min(max(int(request.args.get("limit", DASHBOARD_PAGE_SIZE)), 1), 100)
+        items, next_cursor = _timetable_page(current_user.id, request.args.get("cursor"), limit)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
+    return jsonify({"timetables": items, "next_cursor": next_cursor})
 
 
 @app.route("/planner")
@@ -186,13 +264,12 @@ def logout():
     flash("Logged out","info")
     return redirect(url_for("login"))
 
-@app.route("/api/generate", methods=["POST"])
-@login_required
-def api_generate():
-    body = request.get_json() or {}
+def _plan_args(body, user_id):
+    """
+    Parse the planner form shared by the generate endpoints into
+    create_timetable keyword arguments. Returns (kwargs, error_message).
+    """
     subjects = body.get("subjects", [])
-    daily_hours = float(body.get("daily_hours", 5))
-    schedule_type = body.get("schedule_type", "daily")
     raw_unavail = body.get("unavailable_dates", [])
     unavailable_dates = []
     for d in raw_unavail:
@@ -202,90 +279,245 @@ def api_generate():
             unavailable_dates.append(dt.isoformat())
         except:
             unavailable_dates.append(d)
-    variant = body.get("variant", None)
-    limit_weekends = bool(body.get("limit_weekends", False))
 
     for s in subjects:
         if not s.get("deadline"):
-            return jsonify({"error":"deadline missing for one or more subjects"}), 400
-
-    timetable = create_timetable(
-        subjects=subjects,
-        daily_hours=daily_hours,
-        schedule_type=schedule_type,
-        unavailable_dates=unavailable_dates,
-        variant=variant,
-        limit_weekends=limit_weekends
-    )
+            return None, "deadline missing for one or more subjects"
 
     try:
-        recorded, nrows = record_generated_timetable_as_sessions(current_user, timetable, subjects)
-        app.logger.info("AutoML: recorded %s generated session rows", nrows if recorded else 0)
-    except Exception as e:
-        app.logger.error("AutoML: failed to record generated sessions: %s", e)
-        app.logger.error(traceback.format_exc())
+        slot_minutes = int(body.get("slot_minutes", 30))
+        day_start = datetime.strptime(body.get("day_start", "09:00"), "%H:%M").strftime("%H:%M")
+    except (TypeError, ValueError):
+        return None, "slot_minutes must be an integer and day_start HH:MM"
+    if not 5 <= slot_minutes <= 240:
+        return None, "slot_minutes must be between 5 and 240"
+
+    return {
+        "subjects": subjects,
+        "daily_hours": float(body.get("daily_hours", 5)),
+        "schedule_type": body.get("schedule_type", "daily"),
+        "unavailable_dates": unavailable_dates,
+        "limit_weekends": bool(body.get("limit_weekends", False)),
+        "user_id": user_id,
+        "slot_minutes": slot_minutes,
+        "day_start": day_start
+    }, None
+
+
+def wants_stream(body, accept):
+    return bool(body.get("stream")) or "application/x-ndjson" in (accept or "")
+
+
+def stream_timetable_lines(user_id, variant, kwargs):
+    """
+    Plan with iter_timetable and return an iterator of NDJSON lines (bytes):
+    {"variant": ...}, one {"date": ..., "slots": [...]} per day, then
+    {"done": true, ...}. The first day is computed before returning, so
+    InfeasibleTimetable and other planning errors surface here, before any
+    response is started. Sessions go to the writer every STREAM_FLUSH_DAYS
+    days instead of holding the whole plan.
+    """
+    days = iter_timetable(variant=variant, **kwargs)
+    first = next(days, None)
+
+    def lines():
+        yield app.json.dumps({"variant": variant}).encode() + b"\n"
+        pending = {}
+        try:
+            for day, slots in chain([first] if first else [], days):
+                pending[day] = slots
+                yield app.json.dumps({"date": day, "slots": slots}).encode() + b"\n"
+                if len(pending) >= STREAM_FLUSH_DAYS:
+                    session_writer.submit(user_id, pending, kwargs["subjects"])
+                    pending = {}
+        except Exception as e:
+            app.logger.exception("Streaming timetable generation failed: %s", e)
+            yield app.json.dumps({"error": "Failed to generate timetable"}).encode() + b"\n"
+            return
+        finally:
+            if pending:
+                session_writer.submit(user_id, pending, kwargs["subjects"])
+        yield app.json.dumps({"done": True, "variant": variant, "training_queued": True}).encode() + b"\n"
+
+    return lines()
+
+
+@app.route("/api/generate", methods=["POST"])
+@login_required
+def api_generate():
+    """
+    Plan a timetable. Send "stream": true or "Accept: application/x-ndjson"
+    to receive it day by day as NDJSON (see stream_timetable_lines).
+    """
+    body = request.get_json() or {}
+    kwargs, error = _plan_args(body, current_user.id)
+    if error:
+        return jsonify({"error": error}), 400
+
+    variant = body.get("variant", None)
+    if wants_stream(body, request.headers.get("Accept")):
+        try:
+            lines = stream_timetable_lines(current_user.id, variant, kwargs)
+        except InfeasibleTimetable as e:
+            return jsonify(e.to_dict()), 400
+        return Response(lines, mimetype="application/x-ndjson")
 
     try:
-        train_path = train_and_save(app)
-        app.logger.info("AutoML: trained model at %s", train_path)
-        model_trained = True
-    except Exception as e:
-        app.logger.error("AutoML: training failed: %s", e)
-        app.logger.error(traceback.format_exc())
-        model_trained = False
+        timetable = create_timetable(variant=variant, **kwargs)
+    except InfeasibleTimetable as e:
+        return jsonify(e.to_dict()), 400
+
+    session_writer.submit(current_user.id, timetable, kwargs["subjects"])
 
-    return jsonify({"timetable": timetable, "variant": variant, "model_trained": model_trained})
+    return jsonify({"timetable": timetable, "variant": variant, "training_queued": True})
 
 
 @app.route("/api/reschedule", methods=["POST"])
 @login_required
 def api_reschedule():
+    """
+    Replan from today with a new variant. With "timetable_id" the saved plan
+    is rescheduled incrementally instead (see reschedule_saved_timetable).
+    """
     body = request.get_json() or {}
-    subjects = body.get("subjects", [])
-    daily_hours = float(body.get("daily_hours", 5))
-    schedule_type = body.get("schedule_type", "daily")
-    raw_unavail = body.get("unavailable_dates", [])
-    unavailable_dates = []
-    for d in raw_unavail:
-        try:
-            dt = datetime.fromisoformat(d).date()
-            dt = dt + timedelta(days=1)
-            unavailable_dates.append(dt.isoformat())
-        except:
-            unavailable_dates.append(d)
-    limit_weekends = bool(body.get("limit_weekends", False))
-
-    for s in subjects:
-        if not s.get("deadline"):
-            return jsonify({"error":"deadline missing for one or more subjects"}), 400
+    if body.get("timetable_id") is not None:
+        return reschedule_saved_timetable(body)
+    kwargs, error = _plan_args(body, current_user.id)
+    if error:
+        return jsonify({"error": error}), 400
 
     variant = int(datetime.now().timestamp() * 1000)
-    timetable = create_timetable(
-        subjects=subjects,
-        daily_hours=daily_hours,
-        schedule_type=schedule_type,
-        unavailable_dates=unavailable_dates,
-        variant=variant,
-        limit_weekends=limit_weekends
-    )
+    try:
+        # A fresh timestamp seed is never asked for again: keep it out of the cache.
+        timetable = create_timetable(variant=variant, cache=False, **kwargs)
+    except InfeasibleTimetable as e:
+        return jsonify(e.to_dict()), 400
+
+    session_writer.submit(current_user.id, timetable, kwargs["subjects"])
+
+    return jsonify({"timetable": timetable, "variant": variant, "training_queued": True})
 
+
+def reschedule_saved_timetable(body):
+    """
+    Reschedule saved timetable body["timetable_id"] from body["from_date"]
+    (ISO date, default today): earlier days stay as saved, recorded sessions
+    count as progress, and only the days from then on are planned again. The
+    saved plan arguments are used unless the body carries the planner form
+    ("subjects" etc.). The saved row is only overwritten with "persist": true;
+    otherwise the new plan is returned for the user to save, which they do by
+    sending the same request with its "variant" and "persist": true.
+    """
     try:
-        recorded, nrows = record_generated_timetable_as_sessions(current_user, timetable, subjects)
-        app.logger.info("AutoML (reschedule): recorded %s generated session rows", nrows if recorded else 0)
-    except Exception as e:
-        app.logger.error("AutoML (reschedule): failed to record generated sessions: %s", e)
-        app.logger.error(traceback.format_exc())
+        tt_id = int(body["timetable_id"])
+        from_date = datetime.fromisoformat(body["from_date"]).date() if body.get("from_date") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "timetable_id must be an integer and from_date YYYY-MM-DD"}), 400
+    variant = body.get("variant")
+    if variant is None:
+        variant = int(datetime.now().timestamp() * 1000)
+    elif isinstance(variant, bool) or not isinstance(variant, int):
+        return jsonify({"error": "variant must be an integer"}), 400
+    tt = Timetable.query.filter_by(id=tt_id, user_id=current_user.id).first()
+    if tt is None:
+        return jsonify({"error": "timetable not found"}), 404
+
+    if body.get("subjects"):
+        kwargs, error = _plan_args(body, current_user.id)
+        if error:
+            return jsonify({"error": error}), 400
+    else:
+        kwargs = dict((tt.plan_state or {}).get("plan") or {}, user_id=current_user.id)
 
     try:
-        train_path = train_and_save(app)
-        app.logger.info("AutoML (reschedule): trained model at %s", train_path)
-        model_trained = True
+        timetable, window, state = reschedule_saved(tt, kwargs, from_date, variant, current_user.id)
+    except NoPlanState as e:
+        return jsonify({"error": str(e)}), 400
+    except InfeasibleTimetable as e:
+        return jsonify(e.to_dict()), 400
+
+    persist = body.get("persist") is True
+    if persist:
+        tt.data = pack_for_storage(timetable)
+        tt.plan_state = state
+        tt.variant = str(variant)
+        db.session.commit()
+    # A client-supplied variant replays a plan already shown, and recorded, before.
+    if body.get("variant") is None:
+        session_writer.submit(current_user.id, window, kwargs["subjects"])
+
+    return jsonify({"timetable": timetable, "variant": variant, "timetable_id": tt.id, "persisted": persist,
+                    "from_date": min(window) if window else None, "recomputed_days": len(window),
+                    "training_queued": True})
+
+
+@app.route("/api/generate_variants", methods=["POST"])
+@login_required
+def api_generate_variants():
+    """
+    Generate several alternative timetables for one subject set in parallel
+    and return them best first. Expected JSON is the /api/generate body plus
+    either "variants": [seed, ...] or "count": N (at most MAX_VARIANTS).
+    Nothing is recorded for training; generate the chosen variant to keep it.
+    """
+    body = request.get_json() or {}
+    kwargs, error = _plan_args(body, current_user.id)
+    if error:
+        return jsonify({"error": error}), 400
+
+    variants = body.get("variants")
+    if variants is None:
+        count = body.get("count", 4)
+        if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+            return jsonify({"error": "count must be a positive integer"}), 400
+        base = int(datetime.now().timestamp() * 1000)
+        variants = [base + i for i in range(min(count, MAX_VARIANTS))]
+    elif (not isinstance(variants, list) or not variants
+          or any(isinstance(v, bool) or not isinstance(v, int) for v in variants)):
+        return jsonify({"error": "variants must be a non-empty list of integers"}), 400
+    variants = variants[:MAX_VARIANTS]
+
+    try:
+        ranked = generate_variants(kwargs, variants)
+    except InfeasibleTimetable as e:
+        return jsonify(e.to_dict()), 400
+    except BrokenProcessPool:
+        app.logger.error("Variant pool lost a worker twice in a row")
+        return jsonify({"error": "variant generation is temporarily unavailable"}), 503
+    return jsonify({"alternatives": ranked})
+
+
+@app.route("/api/cohort", methods=["POST"])
+def api_cohort():
+    """
+    Schedule a whole class in one batch. Expected JSON:
+    {"students": [<an /api/generate body plus "user_id" or "email">, ...],
+     "title": optional title for the saved timetables,
+     "save": false to return the plans without storing them}.
+    Authenticated with "Authorization: Bearer $COHORT_TOKEN".
+    """
+    if not COHORT_TOKEN or request.headers.get("Authorization") != f"Bearer {COHORT_TOKEN}":
+        return jsonify({"error": "forbidden"}), 403
+    body = request.get_json() or {}
+    students = body.get("students")
+    if not isinstance(students, list) or not all(isinstance(s, dict) for s in students):
+        return jsonify({"error": "students must be a list of objects"}), 400
+    if len(students) > COHORT_MAX_STUDENTS:
+        return jsonify({"error": f"at most {COHORT_MAX_STUDENTS} students per batch"}), 400
+
+    save = bool(body.get("save", True))
+    try:
+        results, (n_timetables, n_sessions) = run_cohort(students, _plan_args, save=save, title=body.get("title"))
+    except BrokenProcessPool:
+        app.logger.error("Cohort pool lost a worker twice in a row")
+        return jsonify({"error": "cohort scheduling is temporarily unavailable"}), 503
     except Exception as e:
-        app.logger.error("AutoML (reschedule): training failed: %s", e)
+        app.logger.error("Cohort scheduling failed: %s", e)
         app.logger.error(traceback.format_exc())
-        model_trained = False
-
-    return jsonify({"timetable": timetable, "variant": variant, "model_trained": model_trained})
+        return jsonify({"error": "cohort scheduling failed"}), 500
+    if save and n_sessions:
+        _request_training(sorted({r["user_id"] for r in results if "timetable" in r}))
+    return jsonify({"results": results, "saved_timetables": n_timetables, "session_rows": n_sessions})
 
 
 @app.route("/api/save_timetable", methods=["POST"])
@@ -295,7 +527,14 @@ def api_save_timetable():
     title = body.get("title", "")
     timetable_data = body.get("timetable") or {}
     variant = str(body.get("variant", ""))
-    tt = Timetable(user_id=current_user.id, title=title, variant=variant, data=timetable_data)
+    # With the planner form alongside, keep what an incremental reschedule needs.
+    state = None
+    if body.get("subjects"):
+        kwargs, error = _plan_args(body, current_user.id)
+        if not error:
+            state = plan_state(kwargs, timetable_data)
+    tt = Timetable(user_id=current_user.id, title=title, variant=variant,
+                   data=pack_for_storage(timetable_data), plan_state=state)
     db.session.add(tt); db.session.commit()
     return jsonify({"status":"ok","timetable_id": tt.id})
 
@@ -304,7 +543,7 @@ def api_save_timetable():
 @login_required
 def api_load_timetable(tt_id):
     tt = Timetable.query.filter_by(id=tt_id, user_id=current_user.id).first_or_404()
-    return jsonify({"timetable": tt.data, "title": tt.title, "created_at": tt.created_at.isoformat()})
+    return jsonify({"timetable": decode_timetable(tt.data), "title": tt.title, "created_at": tt.created_at.isoformat()})
 
 
 @app.route("/api/delete_timetable/<int:tt_id>", methods=["POST"])
@@ -349,7 +588,8 @@ def api_record_session():
         importance=body.get("importance"),
         syllabus_size=body.get("syllabus_size"),
         days_to_deadline=body.get("days_to_deadline"),
-        task_type=body.get("task_type")
+        task_type=body.get("task_type"),
+        source="recorded"
     )
     db.session.add(sh)
     db.session.commit()
@@ -362,12 +602,33 @@ def api_train_model():
     Trigger model training. You may want to protect this endpoint (admin-only)
     in production. For now it's available to logged-in users.
     """
+    body = request.get_json(silent=True) or {}
     try:
-        path = train_and_save(app)
+        path = run_training(app, incremental=bool(body.get("incremental", False)))
         return jsonify({"status":"ok","model_path": path})
     except Exception as e:
         return jsonify({"status":"error","message": str(e)}), 500
 
+@app.route("/api/model_status", methods=["GET"])
+@login_required
+def api_model_status():
+    entry = registry.resolve(current_user.id)
+    return jsonify({
+        "model_version": entry.version if entry else None,
+        "trained_at": entry.trained_at if entry else None,
+        "registry": registry.stats(),
+        "training": training_worker.status(),
+        "session_writer": session_writer.status(),
+        "timetable_cache": timetable_cache.stats()
+    })
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition. Set METRICS_TOKEN to require a bearer token."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("forbidden\n", status=403, mimetype="text/plain")
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/delete_timetable/<int:tid>")
 @login_required
 def delete_timetable(tid):
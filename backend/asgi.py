@@ -0,0 +1,257 @@
+"""
+ASGI entry point. /api/generate and /api/reschedule are served directly on
+the event loop: the Flask session cookie is verified without a request
+context, create_timetable runs on a small thread pool and the sessions are
+handed to the background SessionWriter, so a waiting planner costs a
+coroutine rather than a worker thread. Every other route runs the Flask WSGI
+app on a thread pool through a small bridge.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from werkzeug.http import parse_cookie
+from app import (app, _plan_args, session_writer, http_requests, http_request_seconds, warm_up,
+                 wants_stream, stream_timetable_lines)
+from scheduler import create_timetable, InfeasibleTimetable
+
+ASGI_SCHEDULER_WORKERS = int(os.environ.get("ASGI_SCHEDULER_WORKERS", min(4, os.cpu_count() or 1)))
+ASGI_MAX_BODY_BYTES = int(os.environ.get("ASGI_MAX_BODY_BYTES", 1024 * 1024))
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 16))
+# A streamed plan is sent in chunks of up to this many days or milliseconds of planning.
+ASGI_STREAM_CHUNK_DAYS = int(os.environ.get("ASGI_STREAM_CHUNK_DAYS", 32))
+ASGI_STREAM_CHUNK_MS = float(os.environ.get("ASGI_STREAM_CHUNK_MS", 20))
+
+# Path -> Flask endpoint name, so metrics line up with the WSGI routes.
+_ASYNC_ROUTES = {"/api/generate": "api_generate", "/api/reschedule": "api_reschedule"}
+
+_executor = ThreadPoolExecutor(max_workers=ASGI_SCHEDULER_WORKERS, thread_name_prefix="scheduler")
+_wsgi_executor = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+def _session_user_id(scope):
+    """Logged-in user id from the signed Flask session cookie, or None."""
+    cookies = {}
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            cookies.update(parse_cookie(value.decode("latin-1")))
+    raw = cookies.get(app.config["SESSION_COOKIE_NAME"])
+    serializer = app.session_interface.get_signing_serializer(app)
+    if not raw or serializer is None:
+        return None
+    try:
+        data = serializer.loads(raw, max_age=int(app.permanent_session_lifetime.total_seconds()))
+        return int(data["_user_id"])
+    except Exception:
+        return None
+
+
+async def _read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > ASGI_MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_json(send, status, payload):
+    body = app.json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+    return status
+
+
+async def _plan(scope, receive, send, user_id):
+    raw = await _read_body(receive)
+    if raw is None:
+        return await _send_json(send, 413, {"error": "Request body too large"})
+    try:
+        body = app.json.loads(raw or b"{}") or {}
+    except ValueError:
+        return await _send_json(send, 400, {"error": "Invalid JSON"})
+
+    if scope["path"] == "/api/reschedule" and body.get("timetable_id") is not None:
+        # Saved-plan reschedules read (and may write) the timetable row: hand them
+        # to Flask, whose after_request hook records the request metrics.
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_wsgi_executor, _run_wsgi, _wsgi_environ(scope, raw), loop, send)
+        return None
+
+    kwargs, error = _plan_args(body, user_id)
+    if error:
+        return await _send_json(send, 400, {"error": error})
+
+    cache = True
+    if scope["path"] == "/api/reschedule":
+        # A fresh timestamp seed is never asked for again: keep it out of the cache.
+        variant, cache = int(datetime.now().timestamp() * 1000), False
+    else:
+        variant = body.get("variant", None)
+        accept = dict(scope.get("headers") or []).get(b"accept", b"").decode("latin-1")
+        if wants_stream(body, accept):
+            return await _stream(send, user_id, variant, kwargs)
+    try:
+        loop = asyncio.get_running_loop()
+        timetable = await loop.run_in_executor(_executor, partial(create_timetable, variant=variant, cache=cache, **kwargs))
+    except InfeasibleTimetable as e:
+        return await _send_json(send, 400, e.to_dict())
+    except Exception as e:
+        app.logger.exception("Async timetable generation failed: %s", e)
+        return await _send_json(send, 500, {"error": "Failed to generate timetable"})
+
+    session_writer.submit(user_id, timetable, kwargs["subjects"])
+    return await _send_json(send, 200, {"timetable": timetable, "variant": variant, "training_queued": True})
+
+
+def _next_chunk(lines):
+    """Up to ASGI_STREAM_CHUNK_DAYS lines, stopping early after ASGI_STREAM_CHUNK_MS."""
+    deadline = time.perf_counter() + ASGI_STREAM_CHUNK_MS / 1000.0
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= ASGI_STREAM_CHUNK_DAYS or time.perf_counter() >= deadline:
+            break
+    return b"".join(chunk)
+
+
+async def _stream(send, user_id, variant, kwargs):
+    loop = asyncio.get_running_loop()
+    try:
+        lines = await loop.run_in_executor(_executor, partial(stream_timetable_lines, user_id, variant, kwargs))
+    except InfeasibleTimetable as e:
+        return await _send_json(send, 400, e.to_dict())
+    except Exception as e:
+        app.logger.exception("Async timetable generation failed: %s", e)
+        return await _send_json(send, 500, {"error": "Failed to generate timetable"})
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/x-ndjson")],
+    })
+    try:
+        while True:
+            chunk = await loop.run_in_executor(_executor, _next_chunk, lines)
+            if not chunk:
+                break
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    finally:
+        lines.close()
+    await send({"type": "http.response.body", "body": b""})
+    return 200
+
+
+def _wsgi_environ(scope, body):
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is already buffered, so its length is known even for chunked uploads.
+    environ.setdefault("CONTENT_LENGTH", str(len(body)))
+    return environ
+
+
+def _run_wsgi(environ, loop, send):
+    """Run the Flask app on a pool thread, streaming its body to send()."""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    def emit(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    result = app(environ, start_response)
+    try:
+        started = False
+        for chunk in result:
+            if not started:
+                emit({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+                started = True
+            if chunk:
+                emit({"type": "http.response.body", "body": chunk, "more_body": True})
+        if not started:
+            emit({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+        emit({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+
+async def wsgi_app(scope, receive, send):
+    raw = await _read_body(receive)
+    if raw is None:
+        return await _send_json(send, 413, {"error": "Request body too large"})
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_wsgi_executor, _run_wsgi, _wsgi_environ(scope, raw), loop, send)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # A no-op when a pre-forking master already loaded the model.
+            await asyncio.get_running_loop().run_in_executor(None, warm_up)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Let queued session rows reach the database before exiting.
+            await asyncio.get_running_loop().run_in_executor(None, session_writer.flush)
+            _executor.shutdown(wait=False)
+            _wsgi_executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in _ASYNC_ROUTES:
+        user_id = _session_user_id(scope)
+        if user_id is not None:
+            t0 = time.perf_counter()
+            status = await _plan(scope, receive, send, user_id)
+            if status is not None:  # None: served by Flask, which recorded it
+                endpoint = _ASYNC_ROUTES[scope["path"]]
+                http_request_seconds.observe(time.perf_counter() - t0, endpoint=endpoint, method="POST")
+                http_requests.inc(endpoint=endpoint, method="POST", status=status)
+            return
+    # Anonymous requests fall through so Flask-Login answers them as usual.
+    return await wsgi_app(scope, receive, send)
@@ -0,0 +1,87 @@
+"""
+Cohort scheduling throughput: a class of students planned one by one (model
+lookup, predict, schedule, session insert and timetable save per student, as
+separate /api/generate + /api/save_timetable calls would) against
+cohort.run_cohort with 1..N worker processes, on a throwaway SQLite database.
+
+    python benchmarks/bench_cohort.py --students 200 --workers 1 2 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--subjects", type=int, default=8)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="studyplanner-cohort-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'cohort.db')}"
+    os.environ["TRAINING_DEBOUNCE_SECONDS"] = "3600"
+
+    import app as app_module
+    import cohort
+    from models import db, User, Timetable
+    from scheduler import create_timetable
+    from session_writer import build_session_rows, insert_session_rows
+    from timetable_codec import pack_for_storage
+    from timetable_cache import timetable_cache
+    from synthetic import make_subjects, make_unavailable
+
+    app = app_module.app
+    with app.app_context():
+        users = [User(name=f"student{i}", email=f"student{i}@example.com", password_hash="x")
+                 for i in range(args.students)]
+        db.session.add_all(users)
+        db.session.commit()
+        ids = [u.id for u in users]
+    students = [{
+        "user_id": ids[i],
+        "subjects": make_subjects(args.subjects, args.days, seed=i),
+        "unavailable_dates": make_unavailable(args.days, 0.1, seed=i),
+        "daily_hours": 6,
+        "variant": i,
+    } for i in range(args.students)]
+
+    def one_by_one():
+        timetable_cache.clear()
+        with app.app_context():
+            for body in students:
+                kwargs, _ = app_module._plan_args(body, body["user_id"])
+                timetable = create_timetable(variant=body["variant"], **kwargs)
+                insert_session_rows(build_session_rows(body["user_id"], timetable, kwargs["subjects"]))
+                db.session.add(Timetable(user_id=body["user_id"], variant=str(body["variant"]),
+                                         data=pack_for_storage(timetable)))
+                db.session.commit()
+
+    def batch(workers):
+        with app.app_context():
+            cohort.run_cohort(students, app_module._plan_args, workers=workers)
+
+    t0 = time.perf_counter()
+    one_by_one()
+    base = time.perf_counter() - t0
+    print(f"{'mode':<22} {'seconds':>8} {'students/s':>11} {'speedup':>8}")
+    print(f"{'one by one':<22} {base:8.2f} {args.students / base:11.1f} {1.0:7.1f}x")
+    for workers in args.workers:
+        batch(workers)  # start the pool before timing
+        t0 = time.perf_counter()
+        batch(workers)
+        elapsed = time.perf_counter() - t0
+        print(f"{f'cohort, {workers} worker(s)':<22} {elapsed:8.2f} {args.students / elapsed:11.1f} "
+              f"{base / elapsed:7.1f}x")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
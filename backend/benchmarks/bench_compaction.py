@@ -0,0 +1,96 @@
+"""
+Session roll-up compaction: session_history rows and full-training time
+before and after compaction.compact_sessions, on a throwaway SQLite database
+seeded with every student regenerating the same plan --regenerations times.
+Also reports how far the weighted model's predictions move from the model
+fitted on the raw rows, over the raw rows' own inputs.
+
+    python benchmarks/bench_compaction.py --users 50 --regenerations 20
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--subjects", type=int, default=8)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--regenerations", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="studyplanner-compaction-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'compaction.db')}"
+    os.environ["STUDYPLANNER_MODEL_PATH"] = os.path.join(tmp, "model.joblib")
+    os.environ["STUDYPLANNER_USER_MODEL_DIR"] = os.path.join(tmp, "user_models")
+    os.environ["TRAINING_DEBOUNCE_SECONDS"] = "3600"
+
+    import app as app_module
+    import numpy as np
+    from compaction import compact_sessions
+    from models import db, User, SessionHistory, SessionRollup
+    from scheduler import create_timetable
+    from session_writer import build_session_rows, insert_session_rows
+    from synthetic import make_subjects
+    from train_model import _load_payload, featurize, load_session_dataframe, train_and_save
+
+    app = app_module.app
+    model_path = os.environ["STUDYPLANNER_MODEL_PATH"]
+    with app.app_context():
+        users = [User(name=f"student{i}", email=f"student{i}@example.com", password_hash="x")
+                 for i in range(args.users)]
+        db.session.add_all(users)
+        db.session.commit()
+        old = datetime.utcnow() - timedelta(days=2)
+        for i, user in enumerate(users):
+            subjects = make_subjects(args.subjects, args.days, seed=i)
+            rows = []
+            for r in range(args.regenerations):
+                timetable = create_timetable(subjects, 6, variant=r)
+                rows.extend(build_session_rows(user.id, timetable, subjects))
+            for row in rows:
+                row["created_at"] = old
+            insert_session_rows(rows)
+        before = db.session.execute(db.select(db.func.count(SessionHistory.id))).scalar()
+
+    raw = load_session_dataframe(app)
+
+    def train():
+        t0 = time.perf_counter()
+        train_and_save(app)
+        elapsed = time.perf_counter() - t0
+        payload = _load_payload(model_path)
+        return elapsed, payload["model"], payload["columns"]
+
+    raw_seconds, raw_model, raw_columns = train()
+    with app.app_context():
+        t0 = time.perf_counter()
+        folded, groups = compact_sessions(older_than_hours=1)
+        compact_seconds = time.perf_counter() - t0
+        after = db.session.execute(db.select(db.func.count(SessionHistory.id))).scalar()
+        rollups = db.session.execute(db.select(db.func.count(SessionRollup.id))).scalar()
+    rolled_seconds, rolled_model, rolled_columns = train()
+
+    X, y = featurize(raw)
+    X = X.reindex(columns=raw_columns, fill_value=0)
+    diff = np.abs(raw_model.predict(X) - rolled_model.predict(X.reindex(columns=rolled_columns, fill_value=0)))
+    print(f"session_history rows   {before:>10} -> {after} (+{rollups} roll-up rows, {folded} folded)")
+    print(f"compaction             {compact_seconds:>10.2f} s")
+    print(f"full training          {raw_seconds:>10.2f} s -> {rolled_seconds:.2f} s "
+          f"({raw_seconds / rolled_seconds:.1f}x)")
+    print(f"same model columns     {raw_columns == rolled_columns!s:>10}")
+    print(f"prediction change      mean {diff.mean():.3f} h, p95 {np.percentile(diff, 95):.3f} h "
+          f"(mean target {y.mean():.2f} h)")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
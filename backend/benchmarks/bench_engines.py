@@ -0,0 +1,63 @@
+"""
+Time the scheduling engines on large horizons and check that "daily_event"
+reproduces "daily" exactly. Prediction is done once up front and excluded,
+so only the scheduling loop is measured.
+
+    python benchmarks/bench_engines.py --days 365 --subjects 50 200
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler
+from synthetic import make_subjects, make_unavailable
+
+
+def make_inputs(days, n, blackout=0.1, seed=0):
+    return make_subjects(n, days, seed), make_unavailable(days, blackout, seed)
+
+
+def run(schedule_type, subjects, unavailable, model, columns, predictions, repeat):
+    original = scheduler._predict_unit_hours
+    scheduler._predict_unit_hours = lambda *args: predictions
+    try:
+        best, result = float("inf"), None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = scheduler._build_timetable(subjects, 6, schedule_type, unavailable, 42, True, model, columns)
+            best = min(best, time.perf_counter() - t0)
+        return best, result
+    finally:
+        scheduler._predict_unit_hours = original
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[90, 365])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-model", action="store_true", help="use the heuristic fallback instead of the model")
+    args = parser.parse_args()
+
+    model, columns = (None, None) if args.no_model else scheduler._load_model()
+    today = date.today()
+    print(f"{'days':>5} {'subjects':>9} {'daily ms':>9} {'daily_event ms':>15} {'speedup':>8}")
+    for days in args.days:
+        for n in args.subjects:
+            subjects, unavailable = make_inputs(days, n)
+            norm = [dict(s, deadline=scheduler._to_date(s["deadline"]), index=i) for i, s in enumerate(subjects)]
+            last_deadline = max(s["deadline"] for s in norm)
+            predictions = scheduler._predict_unit_hours(model, columns, norm, today, (last_deadline - today).days + 1)
+
+            t_loop, a = run("daily", subjects, unavailable, model, columns, predictions, args.repeat)
+            t_event, b = run("daily_event", subjects, unavailable, model, columns, predictions, args.repeat)
+            assert a == b, "daily_event output differs from daily"
+            print(f"{days:>5} {n:>9} {t_loop * 1e3:>9.1f} {t_event * 1e3:>15.1f} {t_loop / t_event:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compare the sklearn forest in a .joblib artifact with its flattened .npz
+export: cold load time and peak RSS growth in a fresh interpreter (imports
+included; RSS is Linux only), size on disk, and horizon prediction latency.
+Exits non-zero if any prediction differs.
+
+    python benchmarks/bench_flat_forest.py --model ml_model.joblib
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import joblib
+import numpy as np
+import scheduler
+from flat_forest import FlatForest, flat_path, load_flat_payload
+from synthetic import make_subjects
+
+_COLD_LOAD = """
+import json, sys, time
+sys.path.insert(0, {backend!r})
+
+def peak_rss_mb():
+    # VmHWM starts fresh at exec, unlike ru_maxrss which a child inherits
+    # from the forking parent.
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+base = peak_rss_mb()
+t0 = time.perf_counter()
+if {flat!r}:
+    from flat_forest import load_flat_payload
+    payload = load_flat_payload({path!r})
+else:
+    import joblib
+    payload = joblib.load({path!r})
+payload["model"].predict([[0.0] * len(payload["columns"])])
+print(json.dumps({{"seconds": time.perf_counter() - t0,
+                  "rss_mb": peak_rss_mb() - base,
+                  "sklearn": "sklearn" in sys.modules}}))
+"""
+
+
+def cold_load(path, flat):
+    code = _COLD_LOAD.format(backend=BACKEND_DIR, path=os.path.abspath(path), flat=flat)
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=os.path.join(BACKEND_DIR, "ml_model.joblib"))
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 180, 365])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    npz = flat_path(args.model)
+    payload = joblib.load(args.model)
+    model, columns = payload["model"], payload["columns"]
+    flat = load_flat_payload(npz)["model"] if os.path.exists(npz) else FlatForest.from_sklearn(model)
+
+    for label, path, is_flat in (("joblib", args.model, False), ("npz", npz, True)):
+        if not os.path.exists(path):
+            continue
+        stats = cold_load(path, is_flat)
+        print(f"{label:>6}: {os.path.getsize(path) / 1024:7.0f} KB on disk, cold import+load+predict "
+              f"{stats['seconds'] * 1e3:7.1f} ms, +{stats['rss_mb']:.0f} MB RSS, sklearn imported: {stats['sklearn']}")
+    print(f"flat arrays in memory: {flat.nbytes / 1024:.0f} KB, {flat.n_cells} cells, "
+          f"lookup table: {flat.table is not None}")
+
+    mismatches = 0
+    today = date.today()
+    print(f"{'days':>5} {'subjects':>9} {'rows':>7} {'sklearn ms':>11} {'flat ms':>8} {'speedup':>8}")
+    for days in args.days:
+        for n in args.subjects:
+            norm = [dict(s, deadline=scheduler._to_date(s["deadline"])) for s in make_subjects(n, days)]
+            t_sk, a = best_of(lambda: scheduler._predict_unit_hours(model, columns, norm, today, days), args.repeat)
+            t_flat, b = best_of(lambda: scheduler._predict_unit_hours(flat, columns, norm, today, days), args.repeat)
+            mismatches += not np.array_equal(a, b)
+            print(f"{days:>5} {n:>9} {n * days:>7} {t_sk * 1e3:>11.2f} {t_flat * 1e3:>8.2f} {t_sk / t_flat:>7.1f}x")
+    print(f"mismatching predictions: {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare per-row model inference (one predict call per subject per day) with the
+batched horizon matrix used by scheduler.create_timetable.
+
+    python benchmarks/bench_inference.py --days 60 180 --subjects 12 50
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import scheduler
+from model_registry import MODEL_PATH
+
+
+def make_subjects(n, days, today):
+    subjects = []
+    for i in range(n):
+        subjects.append({
+            "name": f"Subject {i}",
+            "deadline": today + timedelta(days=(i * 7) % days + 1),
+            "difficulty": 1 + i % 5,
+            "importance": 1 + (i * 3) % 5,
+            "task_type": ["Exam", "Assignment", "Project"][i % 3],
+        })
+    return subjects
+
+
+def per_row(model, columns, subjects, today, days):
+    task_columns = [c for c in columns if c.startswith("task_")]
+    out = np.empty((len(subjects), days))
+    for d in range(days):
+        current = today + timedelta(days=d)
+        for i, s in enumerate(subjects):
+            feat = scheduler._featurize_for_model(s, (s["deadline"] - current).days, task_columns)
+            x = [feat.get(col, 0.0) for col in columns]
+            out[i, d] = max(0.25, min(float(model.predict([x])[0]), 4.0))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 60])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[4, 12])
+    args = parser.parse_args()
+
+    model, columns = scheduler._load_model()
+    if model is None:
+        sys.exit(f"no model found at {MODEL_PATH}")
+    today = date.today()
+
+    print(f"{'days':>6} {'subjects':>9} {'per-row s':>10} {'batched s':>10} {'speedup':>8}")
+    for days in args.days:
+        for n in args.subjects:
+            subjects = make_subjects(n, days, today)
+            t0 = time.perf_counter()
+            slow = per_row(model, columns, subjects, today, days)
+            t1 = time.perf_counter()
+            fast = scheduler._predict_unit_hours(model, columns, subjects, today, days)
+            t2 = time.perf_counter()
+            assert np.allclose(slow, fast), "batched predictions differ from per-row predictions"
+            print(f"{days:>6} {n:>9} {t1 - t0:>10.3f} {t2 - t1:>10.3f} {(t1 - t0) / (t2 - t1):>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
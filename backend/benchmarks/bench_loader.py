@@ -0,0 +1,67 @@
+"""
+Compare the streaming session loader with the previous ORM-object loader on a
+throwaway SQLite database.
+
+    python benchmarks/bench_loader.py --rows 100000 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from models import db, SessionHistory
+from synthetic import make_app, fill_sessions
+import train_model
+
+
+def orm_loader(app):
+    with app.app_context():
+        rows = []
+        for s in SessionHistory.query.all():
+            rows.append({
+                "subject": s.subject,
+                "actual_hours": s.actual_hours,
+                "difficulty": s.difficulty or 3,
+                "importance": s.importance or 3,
+                "syllabus_size": s.syllabus_size or 1.0,
+                "days_to_deadline": s.days_to_deadline if s.days_to_deadline is not None else 30,
+                "task_type": s.task_type or "Other"
+            })
+        return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'orm s':>8} {'stream s':>9} {'rows/s':>10} {'peak rss MB':>12}")
+    for n in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(os.path.join(tmp, "bench.db"))
+            fill_sessions(app, n)
+
+            # Stream first so peak RSS is not inflated by the ORM loader.
+            df = train_model.load_session_dataframe(app)
+            stats = dict(train_model.last_load_stats)
+            X_new, y_new = train_model.featurize(df)
+
+            t0 = time.perf_counter()
+            X_old, y_old = train_model.featurize(orm_loader(app))
+            orm = time.perf_counter() - t0
+
+            assert list(X_old.columns) == list(X_new.columns)
+            assert np.array_equal(X_old.to_numpy(float), X_new.to_numpy(float))
+            assert np.array_equal(y_old.to_numpy(), y_new.to_numpy())
+            print(f"{n:>9} {orm:>8.2f} {stats['seconds']:>9.2f} {stats['rows_per_sec']:>10.0f} {stats['peak_rss_mb']:>12.1f}")
+            with app.app_context():
+                db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
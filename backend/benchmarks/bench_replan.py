@@ -0,0 +1,82 @@
+"""
+Rescheduling cost: a full replan (what /api/reschedule does without a
+timetable_id) against replan.reschedule_saved from a date `window` days
+before the end of a saved plan, for growing horizons. Runs on a throwaway
+SQLite database.
+
+    python benchmarks/bench_replan.py --days 180 365 730 --window 7 30
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[180, 365, 730])
+    parser.add_argument("--window", type=int, nargs="+", default=[7, 30])
+    parser.add_argument("--subjects", type=int, default=50)
+    parser.add_argument("--schedule-type", default="daily")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="studyplanner-replan-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'replan.db')}"
+    os.environ["TRAINING_DEBOUNCE_SECONDS"] = "3600"
+
+    import app as app_module
+    from models import db, User, Timetable
+    from replan import plan_state, reschedule_saved
+    from scheduler import create_timetable
+    from timetable_codec import pack_for_storage
+    from timetable_cache import timetable_cache
+    from synthetic import make_subjects, make_unavailable
+
+    app = app_module.app
+    print(f"{'days':>5} {'window':>7} {'full ms':>9} {'incremental ms':>15} {'speedup':>8}")
+    with app.app_context():
+        user = User(name="bench", email="bench@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        for days in args.days:
+            kwargs = {"subjects": make_subjects(args.subjects, days), "daily_hours": 6,
+                      "schedule_type": args.schedule_type, "unavailable_dates": make_unavailable(days, 0.1),
+                      "user_id": user.id}
+            timetable = create_timetable(variant=1, **kwargs)
+            tt = Timetable(user_id=user.id, data=pack_for_storage(timetable),
+                           plan_state=plan_state(kwargs, timetable))
+            db.session.add(tt)
+            db.session.commit()
+            end = max(date.fromisoformat(d) for d in timetable)
+
+            def full():
+                timetable_cache.clear()
+                create_timetable(variant=2, **kwargs)
+
+            base = timed(full, args.repeat)
+            for window in args.window:
+                from_date = end - timedelta(days=window - 1)
+                elapsed = timed(lambda: reschedule_saved(tt, kwargs, from_date, 2, user.id), args.repeat)
+                print(f"{days:>5} {window:>7} {base * 1e3:>9.1f} {elapsed * 1e3:>15.1f} {base / elapsed:>7.1f}x")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
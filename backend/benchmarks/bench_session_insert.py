@@ -0,0 +1,102 @@
+"""
+Microbenchmark for recording a generated timetable as session_history rows:
+the previous ORM path (one SessionHistory object per slot, deadline parsed
+per slot, bulk_save_objects) against build_session_rows + Core executemany.
+
+    python benchmarks/bench_session_insert.py --days 60 365 --subjects 12 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_app
+from models import db, SessionHistory
+from session_writer import build_session_rows, insert_session_rows
+
+
+def make_plan(days, n):
+    today = date.today()
+    subjects = [{
+        "name": f"Subject {i}",
+        "difficulty": 1 + i % 5,
+        "importance": 1 + (i * 3) % 5,
+        "syllabus_size": 1 + i % 12,
+        "deadline": (today + timedelta(days=days)).isoformat(),
+        "task_type": ["Exam", "Assignment", "Project"][i % 3],
+    } for i in range(n)]
+    timetable = {
+        (today + timedelta(days=d)).isoformat(): [
+            {"subject": f"Subject {(d + k) % n}", "hours": 1.25} for k in range(min(n, 4))
+        ] for d in range(days)
+    }
+    return subjects, timetable
+
+
+def orm_insert(user_id, timetable, subjects_meta):
+    meta_by_name = {}
+    for s in subjects_meta:
+        meta_by_name[s["name"]] = {
+            "difficulty": int(s.get("difficulty") or 3),
+            "importance": int(s.get("importance") or 3),
+            "syllabus_size": float(s.get("syllabus_size") or 1.0),
+            "deadline": s.get("deadline"),
+            "task_type": s.get("task_type") or "Other"
+        }
+    rows = []
+    for date_str, slots in timetable.items():
+        day_date = datetime.fromisoformat(date_str).date()
+        for slot in slots:
+            meta = meta_by_name.get(slot["subject"], {})
+            dl = datetime.fromisoformat(meta["deadline"]).date()
+            rows.append(SessionHistory(
+                user_id=user_id,
+                subject=slot["subject"],
+                actual_hours=float(slot["hours"]),
+                difficulty=meta.get("difficulty"),
+                importance=meta.get("importance"),
+                syllabus_size=meta.get("syllabus_size"),
+                days_to_deadline=max(0, (dl - day_date).days),
+                task_type=meta.get("task_type")
+            ))
+    db.session.bulk_save_objects(rows)
+    db.session.commit()
+    return len(rows)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[60, 365])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[12, 50])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, "bench.db"))
+        print(f"{'days':>6} {'subjects':>9} {'rows':>6} {'orm ms':>8} {'core ms':>8} {'speedup':>8}")
+        with app.app_context():
+            for days in args.days:
+                for n in args.subjects:
+                    subjects, timetable = make_plan(days, n)
+                    rows = len(build_session_rows(1, timetable, subjects))
+                    orm = timed(lambda: orm_insert(1, timetable, subjects), args.repeat)
+                    core = timed(lambda: insert_session_rows(build_session_rows(1, timetable, subjects)), args.repeat)
+                    print(f"{days:>6} {n:>9} {rows:>6} {orm * 1e3:>8.1f} {core * 1e3:>8.1f} {orm / core:>7.1f}x")
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Worker cold start: in a fresh interpreter, the time to import app, serve the
+first page and the first /api/generate (which loads the model), plus peak RSS
+and whether sklearn/pandas ended up loaded. Also lists the slowest top-level
+imports from `python -X importtime`. Point --backend at another checkout to
+compare commits.
+
+    python benchmarks/bench_startup.py --repeat 3
+    python benchmarks/bench_startup.py --backend /tmp/old/backend
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_COLD_START = """
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {backend!r})
+import json
+import app as app_module
+t_import = time.perf_counter()
+client = app_module.app.test_client()
+assert client.get("/login").status_code == 200
+t_page = time.perf_counter()
+client.post("/register", data={{"name": "a", "email": "a@example.com", "password": "a"}})
+client.post("/login", data={{"email": "a@example.com", "password": "a"}})
+r = client.post("/api/generate", json={{"daily_hours": 4, "subjects": [{{"name": "Maths",
+    "syllabus_size": 5, "difficulty": 3, "importance": 4, "deadline": "2099-01-01", "task_type": "Exam"}}]}})
+assert r.status_code == 200, r.status_code
+t_generate = time.perf_counter()
+app_module.session_writer.flush()
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+print(json.dumps({{"import_s": t_import - t0, "first_page_s": t_page - t0,
+                  "first_generate_s": t_generate - t0, "peak_rss_mb": peak_rss_mb(),
+                  "heavy": sorted(m for m in ("sklearn", "pandas", "joblib") if m in sys.modules)}}))
+"""
+
+
+def _env(tmp):
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+    env["TRAINING_DEBOUNCE_SECONDS"] = "3600"
+    return env
+
+
+def cold_start(backend, tmp):
+    db_path = os.path.join(tmp, "startup.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", _COLD_START.format(backend=backend)],
+                         capture_output=True, text=True, check=True, env=_env(tmp), cwd=tmp)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile(backend, tmp, top):
+    """Cumulative microseconds of the slowest modules imported by `import app`."""
+    out = subprocess.run([sys.executable, "-W", "ignore", "-X", "importtime", "-c",
+                          f"import sys; sys.path.insert(0, {backend!r}); import app"],
+                         capture_output=True, text=True, check=True, env=_env(tmp), cwd=tmp)
+    cumulative = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cum, name = line.split("|")
+        name = name.strip()
+        cumulative[name] = max(cumulative.get(name, 0), int(cum))
+    return sorted(cumulative.items(), key=lambda kv: -kv[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default=BACKEND_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+    backend = os.path.abspath(args.backend)
+
+    with tempfile.TemporaryDirectory(prefix="studyplanner-startup-") as tmp:
+        runs = [cold_start(backend, tmp) for _ in range(args.repeat)]
+        print(f"{'module':<32} {'cumulative ms':>14}")
+        for name, us in import_profile(backend, tmp, args.top):
+            print(f"{name:<32} {us / 1e3:>14.1f}")
+
+    for key, label in (("import_s", "import app"), ("first_page_s", "first /login"),
+                       ("first_generate_s", "first /api/generate")):
+        print(f"{label:<22} median {statistics.median(r[key] for r in runs) * 1e3:8.1f} ms")
+    rss = [r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None]
+    if rss:
+        print(f"{'peak RSS':<22} median {statistics.median(rss):8.1f} MB")
+    print(f"heavy modules loaded: {', '.join(runs[-1]['heavy']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
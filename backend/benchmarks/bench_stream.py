@@ -0,0 +1,68 @@
+"""
+Time to first day: create_timetable, which returns the whole horizon at once,
+against iter_timetable, which yields days as they are decided. Reports the
+median time to the first day and to the whole plan for growing horizons.
+
+    python benchmarks/bench_stream.py --days 30 180 365 730 --subjects 10 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from scheduler import create_timetable, iter_timetable
+from timetable_cache import timetable_cache
+from synthetic import make_subjects, make_unavailable
+
+
+def timed(fn, repeat):
+    firsts, totals = [], []
+    for _ in range(repeat):
+        timetable_cache.clear()
+        firsts_t, total_t = fn()
+        firsts.append(firsts_t)
+        totals.append(total_t)
+    return statistics.median(firsts), statistics.median(totals)
+
+
+def run_full(args):
+    t0 = time.perf_counter()
+    create_timetable(*args, variant=1)
+    elapsed = time.perf_counter() - t0
+    return elapsed, elapsed
+
+
+def run_stream(args):
+    t0 = time.perf_counter()
+    days = iter_timetable(*args, variant=1)
+    next(days)
+    first = time.perf_counter() - t0
+    for _ in days:
+        pass
+    return first, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 180, 365, 730])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--schedule-type", default="daily")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    run_stream((make_subjects(5, 30), 6, args.schedule_type, []))  # load the model
+    print(f"{'days':>5} {'subjects':>9} {'full ms':>9} {'stream first ms':>16} {'stream total ms':>16}")
+    for days in args.days:
+        for n in args.subjects:
+            plan = (make_subjects(n, days), 6, args.schedule_type, make_unavailable(days, 0.1))
+            _, full = timed(lambda: run_full(plan), args.repeat)
+            first, total = timed(lambda: run_stream(plan), args.repeat)
+            print(f"{days:>5} {n:>9} {full * 1e3:>9.1f} {first * 1e3:>16.2f} {total * 1e3:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare saved-timetable storage: the plain JSON column against the packed
+format from timetable_codec, on a throwaway SQLite database. Reports the
+stored size and the time to load and decode one row.
+
+    python benchmarks/bench_timetable_storage.py --days 90 365 730 --subjects 12 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_app
+from models import db, User, Timetable
+from timetable_codec import encode_timetable, decode_timetable
+
+
+def make_plan(days, n, per_day=4):
+    today = date.today()
+    return {
+        (today + timedelta(days=d)).isoformat(): [
+            {"subject": f"Subject number {(d * 7 + k) % n}", "hours": round(0.25 + ((d + k) % 15) * 0.25, 2)}
+            for k in range(min(per_day, n))
+        ] for d in range(days)
+    }
+
+
+def load_time(tt_id, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        db.session.expire_all()
+        t0 = time.perf_counter()
+        decode_timetable(db.session.get(Timetable, tt_id).data)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[90, 365, 730])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[12, 50])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, "bench.db"))
+        with app.app_context():
+            user = User(name="bench", email="bench@example.com", password_hash="x")
+            db.session.add(user)
+            db.session.commit()
+            print(f"{'days':>5} {'subjects':>9} {'json KB':>8} {'packed KB':>10} {'ratio':>6} "
+                  f"{'json load ms':>13} {'packed load ms':>15}")
+            for days in args.days:
+                for n in args.subjects:
+                    plan = make_plan(days, n)
+                    packed = encode_timetable(plan)
+                    assert decode_timetable(packed) == plan
+                    rows = [Timetable(user_id=user.id, title="plain", data=plan),
+                            Timetable(user_id=user.id, title="packed", data=packed)]
+                    db.session.add_all(rows)
+                    db.session.commit()
+                    plain_kb = len(json.dumps(plan)) / 1024
+                    packed_kb = len(json.dumps(packed)) / 1024
+                    print(f"{days:>5} {n:>9} {plain_kb:>8.1f} {packed_kb:>10.1f} {plain_kb / packed_kb:>5.1f}x "
+                          f"{load_time(rows[0].id, args.repeat) * 1e3:>13.2f} "
+                          f"{load_time(rows[1].id, args.repeat) * 1e3:>15.2f}")
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
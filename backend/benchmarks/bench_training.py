@@ -0,0 +1,59 @@
+"""
+Compare full retraining with incremental (warm-start) training.
+
+For each size N the full path fits a fresh forest on N rows, while the
+incremental path adds trees to an existing model using only the newest
+`--new-fraction` of those rows, as train_and_save(incremental=True) does.
+
+    python benchmarks/bench_training.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import train_model
+
+
+def synthetic_sessions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    difficulty = rng.integers(1, 6, n)
+    importance = rng.integers(1, 6, n)
+    days = rng.integers(0, 60, n)
+    return pd.DataFrame({
+        "difficulty": difficulty,
+        "importance": importance,
+        "syllabus_size": rng.integers(1, 15, n).astype(float),
+        "days_to_deadline": days,
+        "task_type": rng.choice(["Exam", "Assignment", "Project"], n),
+        "actual_hours": 0.5 + 0.3 * difficulty + 0.1 * importance - 0.01 * days + rng.normal(0, 0.2, n),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--new-fraction", type=float, default=0.01)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'new rows':>9} {'full s':>9} {'incremental s':>14} {'speedup':>8}")
+    for n in args.sizes:
+        X, y = train_model.featurize(synthetic_sessions(n))
+        n_new = max(1, int(n * args.new_fraction))
+
+        t0 = time.perf_counter()
+        model = train_model._fit_full(X, y)
+        full = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        train_model._fit_incremental(model, X.iloc[-n_new:], y.iloc[-n_new:])
+        incremental = time.perf_counter() - t0
+        print(f"{n:>10} {n_new:>9} {full:>9.2f} {incremental:>14.3f} {full / incremental:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Check that compaction.compact_sessions only folds generated sessions: rows
+users recorded and rows written before the source column existed must stay
+in session_history, the latter unless legacy compaction is asked for, and
+sessions added after compaction must get ids past everything folded. Runs
+on a throwaway SQLite database and exits non-zero on failure.
+
+    python benchmarks/check_compaction.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def check(name, ok):
+    print(f"{'ok' if ok else 'FAIL':>4}  {name}")
+    return ok
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix="studyplanner-compaction-check-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+    os.environ["STUDYPLANNER_MODEL_PATH"] = os.path.join(tmp, "model.joblib")
+    os.environ["STUDYPLANNER_USER_MODEL_DIR"] = os.path.join(tmp, "user_models")
+    os.environ["TRAINING_DEBOUNCE_SECONDS"] = "3600"
+
+    import app as app_module
+    from compaction import compact_sessions
+    from models import db, User, SessionHistory, SessionRollup
+
+    def count(source):
+        column = SessionHistory.source
+        where = column.is_(None) if source is None else column == source
+        return db.session.execute(db.select(db.func.count(SessionHistory.id)).where(where)).scalar()
+
+    passed = True
+    with app_module.app.app_context():
+        user = User(name="check", email="check@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        old = datetime.utcnow() - timedelta(days=3)
+
+        def add(source, n, created_at=old):
+            db.session.add_all(SessionHistory(user_id=user.id, subject=f"Subject {i % 3}", actual_hours=1.0 + i % 2,
+                                              difficulty=3, importance=3, syllabus_size=4, days_to_deadline=10,
+                                              task_type="Exam", source=source, created_at=created_at)
+                               for i in range(n))
+            db.session.commit()
+
+        add("recorded", 5)
+        add(None, 7)
+        add("generated", 30)
+
+        folded, _ = compact_sessions(older_than_hours=1)
+        passed &= check("generated rows are folded, bar the newest row",
+                        folded == 29 and count("generated") == 1)
+        passed &= check("recorded rows survive", count("recorded") == 5)
+        passed &= check("legacy rows survive by default", count(None) == 7)
+
+        folded, _ = compact_sessions(older_than_hours=1, include_legacy=True)
+        legacy = db.session.execute(
+            db.select(db.func.sum(SessionRollup.session_count)).where(SessionRollup.source.is_(None))
+        ).scalar()
+        passed &= check("include_legacy folds legacy rows under a NULL source",
+                        folded == 7 and count(None) == 0 and legacy == 7)
+        passed &= check("recorded rows survive legacy compaction", count("recorded") == 5)
+
+        newest = db.session.execute(db.select(db.func.max(SessionHistory.id))).scalar()
+        folded_max = db.session.execute(db.select(db.func.max(SessionRollup.max_session_id))).scalar()
+        add("generated", 3, created_at=datetime.utcnow())
+        fresh = db.session.execute(
+            db.select(db.func.min(SessionHistory.id)).where(SessionHistory.id != newest, SessionHistory.source == "generated")
+        ).scalar()
+        passed &= check("new sessions get ids past every folded row", fresh > folded_max)
+
+    shutil.rmtree(tmp, ignore_errors=True)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
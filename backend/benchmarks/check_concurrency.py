@@ -0,0 +1,106 @@
+"""
+Check that create_timetable output for a given variant does not change when
+many calls run at once in threads and processes, with a trained model served
+through the model registry and timetable_cache. Every variant is asked for
+twice, so the cache sees both misses and hits, and the model file is touched
+before each run so the workers race to reload it. Calls without a variant
+(a fresh seed each) run in between; their seed is not known, so they only
+have to produce a plan. Exits non-zero on mismatch.
+
+    python benchmarks/check_concurrency.py --variants 100 --threads 16
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from flat_forest import flat_path
+
+# A private copy of the model, so touching it never dirties the real one. It
+# is set up before the registry is imported, here and in worker processes.
+if "CHECK_CONCURRENCY_MODEL" not in os.environ:
+    source = os.environ.get("STUDYPLANNER_MODEL_PATH", os.path.join(BACKEND_DIR, "ml_model.joblib"))
+    if not os.path.exists(source):
+        sys.exit(f"no model found at {source}")
+    model_copy = os.path.join(tempfile.mkdtemp(prefix="studyplanner-concurrency-"), "ml_model.joblib")
+    shutil.copy2(source, model_copy)
+    if os.path.exists(flat_path(source)):
+        shutil.copy2(flat_path(source), flat_path(model_copy))
+    os.environ["CHECK_CONCURRENCY_MODEL"] = os.environ["STUDYPLANNER_MODEL_PATH"] = model_copy
+
+import scheduler
+from timetable_cache import timetable_cache
+
+MODEL_COPY = os.environ["CHECK_CONCURRENCY_MODEL"]
+
+
+def make_subjects(n=8):
+    today = date.today()
+    return [{
+        "name": f"Subject {i}",
+        "syllabus_size": 2 + i % 9,
+        "difficulty": 1 + i % 5,
+        "importance": 1 + (i * 3) % 5,
+        "deadline": (today + timedelta(days=7 + i * 5)).isoformat(),
+        "task_type": ["Exam", "Assignment", "Project"][i % 3],
+    } for i in range(n)]
+
+
+def plan(variant, schedule_type="daily"):
+    return scheduler.create_timetable(make_subjects(), 5, schedule_type, variant=variant)
+
+
+def invalidate():
+    """Drop cached plans and make the registry see a changed model file."""
+    timetable_cache.clear()
+    for path in (MODEL_COPY, flat_path(MODEL_COPY)):
+        if os.path.exists(path):
+            os.utime(path, ns=(time.time_ns(), time.time_ns()))
+
+
+def run(executor_cls, workers, calls, schedule_type):
+    with executor_cls(max_workers=workers) as pool:
+        return list(pool.map(plan, calls, [schedule_type] * len(calls)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    if scheduler.registry.resolve() is None:
+        sys.exit(f"model at {MODEL_COPY} could not be loaded")
+    variants = list(range(1, args.variants + 1))
+    calls = variants * 2 + [None] * (args.variants // 4)
+    random.Random(0).shuffle(calls)
+
+    failed = False
+    for schedule_type in ("daily", "alternate", "horizon"):
+        invalidate()
+        expected = {v: plan(v, schedule_type) for v in variants}
+        for label, cls, workers in (("threads", ThreadPoolExecutor, args.threads),
+                                    ("processes", ProcessPoolExecutor, args.processes)):
+            invalidate()
+            t0 = time.perf_counter()
+            got = run(cls, workers, calls, schedule_type)
+            mismatches = sum(result != expected[v] for v, result in zip(calls, got) if v is not None)
+            empty = sum(not result for v, result in zip(calls, got) if v is None)
+            failed |= mismatches > 0 or empty > 0
+            print(f"{schedule_type:>9} {label:>9} x{workers:<3} {len(calls)} calls "
+                  f"{time.perf_counter() - t0:6.2f}s  mismatches={mismatches} empty_unseeded={empty}")
+    shutil.rmtree(os.path.dirname(MODEL_COPY), ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
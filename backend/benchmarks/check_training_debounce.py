@@ -0,0 +1,109 @@
+"""
+Check TrainingWorker's debounce against a fake clock: a quiet period of
+debounce_seconds starts a run, and a steady stream of requests still gets
+one max_wait_seconds after the first of them. Exits non-zero on failure.
+
+    python benchmarks/check_training_debounce.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from training_worker import TrainingWorker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeApp:
+    class logger:
+        info = error = staticmethod(lambda *args: None)
+
+
+def make_worker(debounce, max_wait):
+    clock = FakeClock()
+    trained = []
+    done = threading.Event()
+
+    def train(app, user_id):
+        trained.append((clock.now, user_id))
+        done.set()
+        return "model"
+
+    worker = TrainingWorker(FakeApp, debounce_seconds=debounce, train_fn=train,
+                            max_wait_seconds=max_wait, clock=clock)
+    return worker, clock, trained, done
+
+
+def advance(worker, clock, to):
+    """Move the fake clock and wake the worker so it looks at it again."""
+    clock.now = to
+    with worker._cond:
+        worker._cond.notify_all()
+
+
+def settle(worker, done, expect_run):
+    """True if a run started (waiting up to a second for one when expected)."""
+    ran = done.wait(1.0 if expect_run else 0.2)
+    done.clear()
+    if ran:
+        deadline = time.monotonic() + 1.0
+        while worker.status()["running"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+    return ran
+
+
+def check(name, ok):
+    print(f"{'ok' if ok else 'FAIL':>4}  {name}")
+    return ok
+
+
+def main():
+    passed = True
+
+    worker, clock, trained, done = make_worker(debounce=5, max_wait=20)
+    worker.request()
+    advance(worker, clock, 4.9)
+    passed &= check("no run inside the debounce window", not settle(worker, done, False))
+    advance(worker, clock, 5.0)
+    passed &= check("run once the debounce window is quiet", settle(worker, done, True) and trained == [(5.0, None)])
+
+    worker, clock, trained, done = make_worker(debounce=5, max_wait=20)
+    busy = True
+    for t in range(0, 20, 4):
+        advance(worker, clock, float(t))
+        worker.request(user_id=t)
+        busy &= not settle(worker, done, False)
+    passed &= check("requests every 4 s keep postponing the run", busy)
+    advance(worker, clock, 19.9)
+    passed &= check("no run before max_wait_seconds", not settle(worker, done, False))
+    advance(worker, clock, 20.0)
+    ran = settle(worker, done, True)
+    passed &= check("run at max_wait_seconds after the first request",
+                    ran and trained[0] == (20.0, None) and worker.status()["runs"] == 1
+                    and worker.coalesced == 4)
+    worker.request()
+    advance(worker, clock, 24.0)
+    passed &= check("the cap restarts with the next request", not settle(worker, done, False))
+
+    worker, clock, trained, done = make_worker(debounce=5, max_wait=0)
+    starved = True
+    for t in range(0, 40, 4):
+        advance(worker, clock, float(t))
+        worker.request()
+        starved &= not settle(worker, done, False)
+    passed &= check("max_wait_seconds=0 leaves the debounce uncapped", starved and not trained)
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
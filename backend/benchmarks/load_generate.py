@@ -0,0 +1,132 @@
+"""
+Concurrent load test for /api/generate, /api/save_timetable and the dashboard
+against a throwaway SQLite database, run once with the old rollback-journal
+settings and once with WAL. Each run is a separate process so the SQLite
+pragmas and the app module are configured from scratch.
+
+    python benchmarks/load_generate.py --users 16 --requests 40
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+MODES = {
+    "rollback (before)": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL"},
+    "wal (after)": {"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL"},
+}
+
+
+def make_body(i):
+    today = date.today()
+    return {
+        "subjects": [{
+            "name": f"Subject {k}",
+            "syllabus_size": 2 + k,
+            "difficulty": 1 + k % 5,
+            "importance": 1 + (k * 3) % 5,
+            "deadline": (today + timedelta(days=14 + 7 * k)).isoformat(),
+            "task_type": ["Exam", "Assignment", "Project"][k % 3],
+        } for k in range(6)],
+        "daily_hours": 5,
+        "variant": i,
+    }
+
+
+def worker(app_module, uid, n_requests, latencies, errors):
+    client = app_module.app.test_client()
+    email = f"load{uid}@example.com"
+    client.post("/register", data={"name": f"load{uid}", "email": email, "password": "pw"})
+    client.post("/login", data={"email": email, "password": "pw"})
+    for i in range(n_requests):
+        t0 = time.perf_counter()
+        r = client.post("/api/generate", json=make_body(uid * 1000 + i))
+        if r.status_code == 200:
+            s = client.post("/api/save_timetable", json={"title": f"t{i}", "timetable": r.get_json()["timetable"]})
+            d = client.get("/dashboard")
+            ok = s.status_code == 200 and d.status_code == 200
+        else:
+            ok = False
+        latencies.append(time.perf_counter() - t0)
+        if not ok:
+            errors.append(r.status_code)
+
+
+def run_child(users, n_requests):
+    import app as app_module
+    from models import db, SessionHistory
+
+    latencies, errors = [], []
+    threads = [threading.Thread(target=worker, args=(app_module, u, n_requests, latencies, errors))
+               for u in range(users)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    app_module.session_writer.flush()
+    wall = time.perf_counter() - t0
+    with app_module.app.app_context():
+        sessions = db.session.query(SessionHistory).count()
+    latencies.sort()
+    print(json.dumps({
+        "wall": wall,
+        "rps": len(latencies) / wall,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1e3,
+        "errors": len(errors),
+        "sessions": sessions,
+        "writer_failures": app_module.session_writer.status().get("failures", 0),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=40, help="iterations per user")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.users, args.requests)
+        return
+
+    from model_registry import MODEL_PATH
+    from flat_forest import flat_path
+
+    print(f"{'mode':>18} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'sessions':>9}")
+    for label, pragmas in MODES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            model_copy = os.path.join(tmp, "model.joblib")
+            shutil.copy(MODEL_PATH, model_copy)
+            # Copy the flattened forest too, so the children serve it as production does.
+            if os.path.exists(flat_path(MODEL_PATH)):
+                shutil.copy(flat_path(MODEL_PATH), flat_path(model_copy))
+            env = dict(os.environ, **pragmas,
+                       DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load.db')}",
+                       STUDYPLANNER_MODEL_PATH=model_copy,
+                       STUDYPLANNER_USER_MODEL_DIR=os.path.join(tmp, "user_models"),
+                       TRAINING_DEBOUNCE_SECONDS="0.5",
+                       PYTHONWARNINGS="ignore")
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child",
+                                  "--users", str(args.users), "--requests", str(args.requests)],
+                                 env=env, cwd=BACKEND_DIR, capture_output=True, text=True)
+            if out.returncode != 0:
+                print(out.stderr)
+                sys.exit(1)
+            res = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{label:>18} {res['rps']:>7.1f} {res['p50_ms']:>8.1f} {res['p95_ms']:>8.1f} "
+                  f"{res['errors']:>7} {res['sessions']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Benchmark suite. Times create_timetable for every schedule_type,
+load_session_dataframe, train_and_save (full and incremental) and
+/api/generate through the Flask test client, on seeded synthetic data, and
+writes the results as JSON so two commits can be compared.
+
+Everything runs against a temporary directory: the database, the global
+model (a copy of ml_model.joblib) and per-user models, so the committed
+artifacts are never touched.
+
+    python benchmarks/run_benchmarks.py --quick
+    python benchmarks/run_benchmarks.py --only scheduler api --out before.json
+    python benchmarks/run_benchmarks.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+SCHEDULE_TYPES = ["daily", "alternate", "daily_event", "slots", "horizon"]
+GROUPS = ["scheduler", "loader", "training", "api"]
+
+GRIDS = {
+    "quick": {
+        "subjects": [10, 50],
+        "horizon": [30, 180],
+        "blackout": [0.1],
+        "sessions": [10_000],
+        "api_subjects": [10],
+        "repeat": 3,
+    },
+    "full": {
+        "subjects": [10, 50, 200],
+        "horizon": [30, 180, 365],
+        "blackout": [0.0, 0.3],
+        "sessions": [10_000, 100_000],
+        "api_subjects": [10, 50],
+        "repeat": 5,
+    },
+}
+
+
+def _isolate(tmp):
+    """Point the app at throwaway paths before any backend module is imported."""
+    model_copy = os.path.join(tmp, "ml_model.joblib")
+    # The .npz flattened forest is what the registry serves; without it the
+    # suite would time the sklearn fallback instead.
+    for name in ("ml_model.joblib", "ml_model.npz"):
+        source = os.path.join(BACKEND_DIR, name)
+        if os.path.exists(source):
+            shutil.copy(source, os.path.join(tmp, name))
+    os.environ["STUDYPLANNER_MODEL_PATH"] = model_copy
+    os.environ["STUDYPLANNER_USER_MODEL_DIR"] = os.path.join(tmp, "user_models")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'api.db')}"
+    # Keep the background trainer from competing with the timed code.
+    os.environ["TRAINING_DEBOUNCE_SECONDS"] = "3600"
+
+
+def measure(fn, repeat, warmup=1, setup=None):
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        "best_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times),
+        "repeat": repeat,
+    }
+
+
+def bench_scheduler(grid, tmp):
+    from scheduler import create_timetable, InfeasibleTimetable
+    from timetable_cache import timetable_cache
+    from synthetic import make_subjects, make_unavailable
+
+    def plan(*args):
+        # "horizon" rejects plans that cannot fit; that check is what gets timed.
+        try:
+            create_timetable(*args, variant=42)
+            return True
+        except InfeasibleTimetable:
+            return False
+
+    results = []
+    for schedule_type in SCHEDULE_TYPES:
+        for n in grid["subjects"]:
+            for horizon in grid["horizon"]:
+                for blackout in grid["blackout"]:
+                    subjects = make_subjects(n, horizon)
+                    unavailable = make_unavailable(horizon, blackout)
+                    fn = lambda: plan(subjects, 6, schedule_type, unavailable)
+                    # Clearing the cache first times a real build, not a lookup.
+                    stats = measure(fn, grid["repeat"], setup=timetable_cache.clear)
+                    feasible = fn()
+                    results.append({
+                        "name": "create_timetable",
+                        "params": {"schedule_type": schedule_type, "subjects": n,
+                                   "horizon": horizon, "blackout": blackout},
+                        **stats,
+                        "extra": {"feasible": feasible},
+                    })
+                    print(f"  create_timetable {schedule_type:>11} n={n:<4} days={horizon:<4} "
+                          f"blackout={blackout:<4} {stats['median_s'] * 1e3:9.1f} ms"
+                          f"{'' if feasible else '  (infeasible)'}")
+    return results
+
+
+def bench_loader(grid, tmp):
+    import train_model
+    from models import db
+    from synthetic import make_app, fill_sessions
+
+    results = []
+    for rows in grid["sessions"]:
+        app = make_app(os.path.join(tmp, f"loader_{rows}.db"))
+        fill_sessions(app, rows)
+        stats = measure(lambda: train_model.load_session_dataframe(app), grid["repeat"])
+        results.append({
+            "name": "load_session_dataframe",
+            "params": {"rows": rows},
+            **stats,
+            "extra": {"rows_per_sec": train_model.last_load_stats.get("rows_per_sec")},
+        })
+        print(f"  load_session_dataframe rows={rows:<8} {stats['median_s'] * 1e3:9.1f} ms")
+        with app.app_context():
+            db.engine.dispose()
+    return results
+
+
+def bench_training(grid, tmp):
+    import train_model
+    from models import db
+    from synthetic import make_app, fill_sessions
+
+    results = []
+    for rows in grid["sessions"]:
+        app = make_app(os.path.join(tmp, f"training_{rows}.db"))
+        fill_sessions(app, rows)
+        stats = measure(lambda: train_model.train_and_save(app), 1, warmup=0)
+        results.append({"name": "train_and_save", "params": {"rows": rows, "mode": "full"}, **stats})
+        print(f"  train_and_save full        rows={rows:<8} {stats['median_s']:9.2f} s")
+
+        # Each incremental run needs fresh rows past the watermark.
+        new_rows = max(1, rows // 100)
+        seeds = iter(range(1, 1000))
+        stats = measure(lambda: train_model.train_and_save(app, incremental=True), grid["repeat"], warmup=0,
+                        setup=lambda: fill_sessions(app, new_rows, seed=next(seeds)))
+        results.append({"name": "train_and_save", "params": {"rows": rows, "mode": "incremental",
+                                                             "new_rows": new_rows}, **stats})
+        print(f"  train_and_save incremental rows={rows:<8} {stats['median_s']:9.2f} s")
+        with app.app_context():
+            db.engine.dispose()
+    return results
+
+
+def bench_api(grid, tmp):
+    import app as app_module
+    from synthetic import make_subjects
+
+    client = app_module.app.test_client()
+    client.post("/register", data={"name": "bench", "email": "bench@example.com", "password": "bench"})
+    client.post("/login", data={"email": "bench@example.com", "password": "bench"})
+
+    results = []
+    variants = iter(range(1, 1_000_000))
+    for n in grid["api_subjects"]:
+        for horizon in grid["horizon"]:
+            subjects = make_subjects(n, horizon)
+            for cached in (False, True):
+                def post():
+                    body = {"subjects": subjects, "daily_hours": 6,
+                            "variant": 7 if cached else next(variants)}
+                    r = client.post("/api/generate", json=body)
+                    assert r.status_code == 200, r.status_code
+
+                stats = measure(post, grid["repeat"], setup=app_module.session_writer.flush)
+                results.append({
+                    "name": "api_generate",
+                    "params": {"subjects": n, "horizon": horizon, "cached": cached},
+                    **stats,
+                })
+                print(f"  /api/generate n={n:<4} days={horizon:<4} cached={cached!s:<5} "
+                      f"{stats['median_s'] * 1e3:9.1f} ms")
+    app_module.session_writer.flush()
+    return results
+
+
+BENCHES = {
+    "scheduler": bench_scheduler,
+    "loader": bench_loader,
+    "training": bench_training,
+    "api": bench_api,
+}
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta(size):
+    import numpy
+    import sklearn
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "size": size,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def _key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    before = {_key(r): r for r in old["results"]}
+    regressions = 0
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    print(f"{'benchmark':<24} {'params':<64} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for r in new["results"]:
+        prev = before.get(_key(r))
+        if prev is None:
+            continue
+        ratio = r["median_s"] / prev["median_s"] if prev["median_s"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{r['name']:<24} {_key(r)[1]:<64} {prev['median_s'] * 1e3:>10.2f} "
+              f"{r['median_s'] * 1e3:>10.2f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="small grid for a fast check")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--out", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="median slowdown ratio reported as a regression by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    size = "quick" if args.quick else "full"
+    grid = GRIDS[size]
+    tmp = tempfile.mkdtemp(prefix="studyplanner-bench-")
+    try:
+        _isolate(tmp)
+        results = []
+        for group in args.only:
+            print(f"[{group}]")
+            results.extend(BENCHES[group](grid, tmp))
+        report = {"meta": _meta(size), "results": results}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    out = args.out or os.path.join(BENCH_DIR, "results", f"{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Synthetic inputs shared by the benchmarks: planner subjects, blackout dates,
+throwaway SQLite apps and session_history rows. Everything is seeded so two
+runs (or two commits) see the same data.
+"""
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from flask import Flask
+from models import db, SessionHistory
+
+TASK_TYPES = ["Exam", "Assignment", "Project"]
+
+
+def make_subjects(n, horizon_days, seed=0):
+    """n planner subjects with deadlines spread over the next horizon_days."""
+    rng = random.Random(seed)
+    today = date.today()
+    return [{
+        "name": f"Subject {i}",
+        "syllabus_size": rng.randint(1, 20),
+        "difficulty": rng.randint(1, 5),
+        "importance": rng.randint(1, 5),
+        "deadline": (today + timedelta(days=rng.randint(min(7, horizon_days), horizon_days))).isoformat(),
+        "task_type": rng.choice(TASK_TYPES),
+    } for i in range(n)]
+
+
+def make_unavailable(horizon_days, density, seed=0):
+    """ISO dates in the horizon that are blacked out with probability density."""
+    rng = random.Random(seed)
+    today = date.today()
+    return [(today + timedelta(days=d)).isoformat() for d in range(horizon_days) if rng.random() < density]
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def fill_sessions(app, n, seed=0, batch=50_000, user_id=None):
+    rng = np.random.default_rng(seed)
+    tasks = np.array(TASK_TYPES + [None], dtype=object)
+    with app.app_context():
+        for start in range(0, n, batch):
+            m = min(batch, n - start)
+            rows = [{
+                "user_id": user_id,
+                "subject": f"Subject {i % 40}",
+                "actual_hours": float(h),
+                "difficulty": int(d),
+                "importance": int(imp),
+                "syllabus_size": float(size),
+                "days_to_deadline": int(days),
+                "task_type": task,
+            } for i, h, d, imp, size, days, task in zip(
+                range(start, start + m),
+                rng.uniform(0.25, 4, m),
+                rng.integers(1, 6, m),
+                rng.integers(1, 6, m),
+                rng.integers(1, 15, m),
+                rng.integers(0, 60, m),
+                tasks[rng.integers(0, 4, m)],
+            )]
+            db.session.execute(SessionHistory.__table__.insert(), rows)
+            db.session.commit()
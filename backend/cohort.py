@@ -0,0 +1,275 @@
+"""
+Batch scheduling for a whole class. Every student's plan is built from one
+model lookup per distinct model and a single predict call over all of their
+feature rows. The scheduling engines then run on a process pool, and all
+Timetable and SessionHistory rows are written in one transaction.
+
+    python cohort.py students.json --out plans.json
+
+students.json is a list of /api/generate bodies, each with a "user_id" or
+"email" naming the student.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime
+from functools import partial
+import numpy as np
+from sqlalchemy import select
+from models import db, User, Timetable, SessionHistory
+from model_registry import registry
+from scheduler import (InfeasibleTimetable, _feature_rows, _last_deadline, _normalize_subjects,
+                       _run_engine)
+from replan import plan_state
+from session_writer import build_session_rows
+from timetable_codec import pack_for_storage
+from metrics import metrics, span
+from process_pool import SpawnPool
+
+COHORT_WORKERS = int(os.environ.get("COHORT_WORKERS", os.cpu_count() or 1))
+COHORT_MAX_STUDENTS = int(os.environ.get("COHORT_MAX_STUDENTS", 1000))
+# Students per pool task: enough to amortise pickling, small enough to balance.
+COHORT_CHUNK = int(os.environ.get("COHORT_CHUNK", 8))
+
+_session_rows = metrics.counter("session_rows_total", "Generated session rows written to session_history.")
+_cohort_students = metrics.counter("cohort_students_total", "Students scheduled through the cohort API.")
+
+_pool = SpawnPool(COHORT_WORKERS)
+
+
+def _schedule_chunk(jobs):
+    """Run the engines for (index, plan, norm, last_deadline, unit_hours, today) jobs."""
+    out = []
+    for index, plan, norm, last_deadline, unit_hours, today in jobs:
+        try:
+            timetable = _run_engine(
+                norm, plan["daily_hours"], plan.get("schedule_type", "daily"),
+                plan.get("unavailable_dates") or [], plan.get("limit_weekends", False),
+                today, last_deadline, unit_hours, random.Random(int(plan["variant"])),
+                plan.get("slot_minutes", 30), plan.get("day_start", "09:00")
+            )
+            out.append((index, timetable, None))
+        except InfeasibleTimetable as e:
+            out.append((index, None, e.to_dict()))
+    return out
+
+
+def _map_chunks(chunks, executor):
+    return list(executor.map(_schedule_chunk, chunks))
+
+
+def _predict_all(plans, norms, today):
+    """
+    Predicted unit hours for every plan: one predict per distinct model over
+    the concatenated feature rows of every plan that uses it.
+    """
+    unit_hours = [None] * len(plans)
+    groups = {}
+    with span("model_load", path="cohort"):
+        for i, plan in enumerate(plans):
+            if not norms[i]:
+                continue
+            entry = registry.resolve(plan.get("user_id"))
+            if entry is not None:
+                groups.setdefault(id(entry), (entry, []))[1].append(i)
+
+    with span("predict", path="cohort"):
+        for entry, members in groups.values():
+            blocks, shapes = [], []
+            for i in members:
+                num_days = (_last_deadline(norms[i], today) - today).days + 1
+                X = _feature_rows(entry.model, entry.columns, norms[i], today, num_days)
+                if X is not None:
+                    blocks.append(X)
+                    shapes.append((i, len(norms[i]), num_days))
+            if not blocks:
+                continue
+            try:
+                preds = np.asarray(entry.model.predict(np.vstack(blocks)), dtype=float)
+            except Exception:
+                continue
+            preds = np.clip(preds, 0.25, 4.0)
+            start = 0
+            for i, n, num_days in shapes:
+                unit_hours[i] = preds[start:start + n * num_days].reshape(n, num_days)
+                start += n * num_days
+    return unit_hours
+
+
+def schedule_cohort(plans, workers=None):
+    """
+    Timetables for a list of create_timetable keyword dicts, each with an
+    explicit "variant". Returns (timetable, None, unit_hours) or
+    (None, infeasible dict, unit_hours) per plan, in order, unit_hours being
+    the predictions the plan was made with (None without a model); for a
+    given variant the timetable matches create_timetable's.
+    """
+    workers = COHORT_WORKERS if workers is None else max(1, int(workers))
+    today = datetime.now().date()
+    norms = [_normalize_subjects(plan["subjects"]) for plan in plans]
+    unit_hours = _predict_all(plans, norms, today)
+
+    outcomes = [({}, None, None)] * len(plans)
+    jobs = [(i, plan, norms[i], _last_deadline(norms[i], today), unit_hours[i], today)
+            for i, plan in enumerate(plans) if norms[i]]
+    chunks = [jobs[k:k + COHORT_CHUNK] for k in range(0, len(jobs), COHORT_CHUNK)]
+    if workers == 1 or len(chunks) <= 1:
+        done = map(_schedule_chunk, chunks)
+    else:
+        # Chunks are pure functions of their plans, so a retry after a worker died is safe.
+        done = _pool.run(partial(_map_chunks, chunks), workers)
+    for chunk in done:
+        for index, timetable, error in chunk:
+            outcomes[index] = (timetable, error, unit_hours[index])
+    return outcomes
+
+
+def save_cohort(results, title=None):
+    """
+    Write a Timetable row and the generated session rows for every scheduled
+    result in one transaction. Needs an app context.
+    """
+    now = datetime.utcnow()
+    timetables, sessions = [], []
+    for r in results:
+        if r.get("timetable") is None:
+            continue
+        timetables.append({
+            "user_id": r["user_id"],
+            "created_at": now,
+            "variant": str(r["variant"]),
+            "title": title or f"Cohort plan {now:%Y-%m-%d}",
+            "data": pack_for_storage(r["timetable"]),
+            "plan_state": r.get("plan_state"),
+        })
+        sessions.extend(build_session_rows(r["user_id"], r["timetable"], r["subjects"]))
+    if not timetables:
+        return 0, 0
+    with span("session_insert", path="cohort"):
+        try:
+            db.session.execute(Timetable.__table__.insert(), timetables)
+            if sessions:
+                db.session.execute(SessionHistory.__table__.insert(), sessions)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    _session_rows.inc(len(sessions))
+    return len(timetables), len(sessions)
+
+
+def _parse_user_id(value):
+    """(id, error) for a student's "user_id": an integer or a numeric string, never a bool."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None, "user_id must be an integer"
+    try:
+        return int(value), None
+    except ValueError:
+        return None, "user_id must be an integer"
+
+
+def _user_ids(students):
+    """
+    (user_id, error) for each student, from "user_id" or, without one,
+    "email"; user_id is None when the student is unknown or error is set.
+    """
+    emails = {s["email"] for s in students if s.get("email") and s.get("user_id") is None}
+    ids = {}
+    if emails:
+        ids = dict(db.session.execute(select(User.email, User.id).where(User.email.in_(emails))).all())
+    parsed = [_parse_user_id(s["user_id"]) if s.get("user_id") is not None else (None, None) for s in students]
+    wanted = {user_id for user_id, _ in parsed if user_id is not None}
+    known = set(db.session.execute(select(User.id).where(User.id.in_(wanted))).scalars()) if wanted else set()
+    out = []
+    for s, (user_id, error) in zip(students, parsed):
+        if error is not None:
+            out.append((None, error))
+        elif s.get("user_id") is not None:
+            out.append((user_id if user_id in known else None, None))
+        else:
+            out.append((ids.get(s.get("email")), None))
+    return out
+
+
+def run_cohort(students, plan_args, save=True, title=None, workers=None):
+    """
+    Validate, schedule and (optionally) store plans for a list of
+    /api/generate bodies naming their student. `plan_args` is app._plan_args.
+    Returns one result dict per student, in order. Needs an app context.
+    """
+    base = int(datetime.now().timestamp() * 1000)
+    results, plans = [], []
+    for i, (body, (user_id, error)) in enumerate(zip(students, _user_ids(students))):
+        result = {"index": i, "user_id": user_id}
+        results.append(result)
+        if error is not None:
+            result["error"] = error
+            continue
+        if user_id is None:
+            result["error"] = "unknown student: give an existing user_id or email"
+            continue
+        kwargs, error = plan_args(body, user_id)
+        if error:
+            result["error"] = error
+            continue
+        try:
+            kwargs["variant"] = int(body.get("variant", base + i))
+        except (TypeError, ValueError):
+            result["error"] = "variant must be an integer"
+            continue
+        result["variant"] = kwargs["variant"]
+        result["subjects"] = kwargs["subjects"]
+        plans.append((result, kwargs))
+
+    outcomes = schedule_cohort([kwargs for _, kwargs in plans], workers)
+    for (result, kwargs), (timetable, error, unit_hours) in zip(plans, outcomes):
+        if error is not None:
+            result.update(error)
+        else:
+            result["timetable"] = timetable
+            if save:
+                result["plan_state"] = plan_state(kwargs, timetable, unit_hours)
+    _cohort_students.inc(len(plans))
+
+    saved = save_cohort(results, title) if save else (0, 0)
+    for result in results:
+        result.pop("subjects", None)
+        result.pop("plan_state", None)
+    return results, saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schedule a whole class in one batch.")
+    parser.add_argument("students", help="JSON file with a list of /api/generate bodies plus user_id or email")
+    parser.add_argument("--workers", type=int, default=COHORT_WORKERS)
+    parser.add_argument("--title", help="title of the saved timetables")
+    parser.add_argument("--dry-run", action="store_true", help="schedule without writing to the database")
+    parser.add_argument("--out", help="write the timetables here as JSON")
+    args = parser.parse_args()
+
+    with open(args.students) as f:
+        students = json.load(f)
+    if not isinstance(students, list):
+        sys.exit("students file must hold a JSON list")
+
+    from app import app, _plan_args
+    with app.app_context():
+        started = datetime.now()
+        results, (n_timetables, n_sessions) = run_cohort(
+            students, _plan_args, save=not args.dry_run, title=args.title, workers=args.workers)
+        elapsed = (datetime.now() - started).total_seconds()
+
+    failed = [r for r in results if "error" in r]
+    print(f"Scheduled {len(results) - len(failed)} of {len(results)} students in {elapsed:.2f}s; "
+          f"saved {n_timetables} timetables and {n_sessions} session rows")
+    for r in failed:
+        print(f"  student {r['index']}: {r['error']}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Roll-up compaction of generated session_history rows.
+
+Every generate and reschedule writes one row per (day, subject) of the
+planned timetable, so the table fills up with near-duplicates. Generated
+rows older than SESSION_COMPACT_AFTER_HOURS are folded into session_rollup,
+one row per user, source and set of model inputs holding a session count
+and mean hours, and then deleted. Sessions users recorded themselves stay
+in session_history untouched. So do rows written before the source column
+existed, which may be recorded sessions too, unless legacy compaction is
+asked for (SESSION_COMPACT_LEGACY=1 or --include-legacy); those roll-ups
+keep their NULL source, so they never merge with known generated rows.
+The newest session_history row is never folded: SQLite hands out
+max(rowid) + 1, so deleting it would let new sessions reuse ids at or
+below the training watermark and the roll-ups' max_session_id.
+
+    python compaction.py --older-than-hours 24 [--include-legacy]
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, or_, select, update
+from models import db, SessionHistory, SessionRollup
+from metrics import metrics, span
+
+SESSION_COMPACT_AFTER_HOURS = float(os.environ.get("SESSION_COMPACT_AFTER_HOURS", 24))
+SESSION_COMPACT_BATCH = int(os.environ.get("SESSION_COMPACT_BATCH", 50_000))
+SESSION_COMPACT_LEGACY = os.environ.get("SESSION_COMPACT_LEGACY", "0") == "1"
+# The training worker compacts at most this often; 0 leaves it to the CLI.
+SESSION_COMPACT_INTERVAL_SECONDS = float(os.environ.get("SESSION_COMPACT_INTERVAL_SECONDS", 6 * 3600))
+
+_compacted_rows = metrics.counter("session_rows_compacted_total",
+                                  "Generated session_history rows folded into session_rollup.")
+
+_KEY = ("user_id", "source", "difficulty", "importance", "syllabus_size", "days_to_deadline", "task_type")
+
+_last_run = None
+_last_run_lock = threading.Lock()
+
+
+def _key_columns():
+    """The roll-up key over session_history, with load_session_dataframe's defaults applied."""
+    return (
+        SessionHistory.user_id,
+        SessionHistory.source,
+        func.coalesce(func.nullif(SessionHistory.difficulty, 0), 3),
+        func.coalesce(func.nullif(SessionHistory.importance, 0), 3),
+        func.coalesce(func.nullif(SessionHistory.syllabus_size, 0), 1.0),
+        func.coalesce(SessionHistory.days_to_deadline, 30),
+        func.coalesce(func.nullif(SessionHistory.task_type, ""), "Other"),
+    )
+
+
+def _compactable(cutoff, include_legacy):
+    if include_legacy:
+        return (SessionHistory.created_at < cutoff,
+                or_(SessionHistory.source.is_(None), SessionHistory.source == "generated"))
+    return (SessionHistory.created_at < cutoff, SessionHistory.source == "generated")
+
+
+def _compact_range(lo, hi, cutoff, include_legacy):
+    """Fold compactable rows with lo <= id <= hi in one transaction; returns (rows, groups)."""
+    where = (SessionHistory.id.between(lo, hi), *_compactable(cutoff, include_legacy))
+    keys = _key_columns()
+    groups = db.session.execute(
+        select(*keys, func.count(), func.sum(SessionHistory.actual_hours), func.max(SessionHistory.id))
+        .where(*where).group_by(*keys)
+    ).all()
+    if not groups:
+        return 0, 0
+
+    users = {g[0] for g in groups}
+    owners = [SessionRollup.user_id.in_([u for u in users if u is not None])]
+    if None in users:
+        owners.append(SessionRollup.user_id.is_(None))
+    existing = {}
+    for row in db.session.execute(
+        select(*(getattr(SessionRollup, k) for k in _KEY), SessionRollup.id, SessionRollup.session_count,
+               SessionRollup.mean_hours, SessionRollup.max_session_id).where(or_(*owners))
+    ):
+        existing[tuple(row[:len(_KEY)])] = row[len(_KEY):]
+
+    now = datetime.utcnow()
+    inserts, updates, rows = [], [], 0
+    for *key, count, total, max_id in groups:
+        rows += count
+        found = existing.get(tuple(key))
+        if found is None:
+            inserts.append(dict(zip(_KEY, key), session_count=count, mean_hours=total / count,
+                                max_session_id=max_id, updated_at=now))
+        else:
+            rollup_id, old_count, old_mean, old_max = found
+            merged = old_count + count
+            updates.append({"id": rollup_id, "session_count": merged,
+                            "mean_hours": (old_mean * old_count + total) / merged,
+                            "max_session_id": max(old_max, max_id), "updated_at": now})
+    try:
+        if inserts:
+            db.session.execute(SessionRollup.__table__.insert(), inserts)
+        if updates:
+            db.session.execute(update(SessionRollup), updates)
+        db.session.execute(delete(SessionHistory).where(*where))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return rows, len(groups)
+
+
+def compact_sessions(older_than_hours=None, batch_size=SESSION_COMPACT_BATCH, include_legacy=None):
+    """
+    Fold generated session_history rows created more than `older_than_hours`
+    (default SESSION_COMPACT_AFTER_HOURS) ago into session_rollup, walking
+    the ids `batch_size` at a time with one transaction per batch. Rows with
+    no source are only folded with `include_legacy` (default
+    SESSION_COMPACT_LEGACY), and the newest row is always kept. Returns
+    (rows folded, roll-up groups written). Needs an app context.
+    """
+    hours = SESSION_COMPACT_AFTER_HOURS if older_than_hours is None else float(older_than_hours)
+    include_legacy = SESSION_COMPACT_LEGACY if include_legacy is None else include_legacy
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    lo, hi = db.session.execute(
+        select(func.min(SessionHistory.id), func.max(SessionHistory.id))
+        .where(*_compactable(cutoff, include_legacy))
+    ).one()
+    rows = groups = 0
+    if lo is None:
+        return rows, groups
+    newest = db.session.execute(select(func.max(SessionHistory.id))).scalar()
+    hi = min(hi, newest - 1)
+    with span("session_compact"):
+        while lo <= hi:
+            top = min(lo + batch_size - 1, hi)
+            n, g = _compact_range(lo, top, cutoff, include_legacy)
+            rows += n
+            groups += g
+            lo = top + 1
+    _compacted_rows.inc(rows)
+    return rows, groups
+
+
+def maybe_compact(app):
+    """compact_sessions at most every SESSION_COMPACT_INTERVAL_SECONDS; None when skipped."""
+    global _last_run
+    if SESSION_COMPACT_INTERVAL_SECONDS <= 0:
+        return None
+    with _last_run_lock:
+        now = time.monotonic()
+        if _last_run is not None and now - _last_run < SESSION_COMPACT_INTERVAL_SECONDS:
+            return None
+        _last_run = now
+    with app.app_context():
+        return compact_sessions()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold old generated sessions into session_rollup.")
+    parser.add_argument("--older-than-hours", type=float, default=SESSION_COMPACT_AFTER_HOURS)
+    parser.add_argument("--batch-size", type=int, default=SESSION_COMPACT_BATCH)
+    parser.add_argument("--include-legacy", action="store_true", default=SESSION_COMPACT_LEGACY,
+                        help="also fold rows written before session sources were recorded")
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        started = time.perf_counter()
+        rows, groups = compact_sessions(args.older_than_hours, args.batch_size, args.include_legacy)
+        left = db.session.execute(select(func.count(SessionHistory.id))).scalar()
+        total = db.session.execute(select(func.count(SessionRollup.id))).scalar()
+    print(f"Folded {rows} session rows into {groups} roll-up groups in {time.perf_counter() - started:.2f}s; "
+          f"{left} session rows and {total} roll-up rows remain")
+
+
+if __name__ == "__main__":
+    main()
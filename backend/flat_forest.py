@@ -0,0 +1,204 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+FLAT_FOREST_SUFFIX = ".npz"
+ENABLE_FLAT_FOREST = os.environ.get("FLAT_FOREST", "1") != "0"
+PREDICT_CHUNK_ROWS = 1024
+# Forests whose split thresholds cut the input space into at most this many
+# cells get a precomputed prediction per cell.
+LOOKUP_MAX_CELLS = int(os.environ.get("FLAT_FOREST_LOOKUP_MAX_CELLS", 1 << 16))
+
+_LEAF = -1
+
+
+def flat_path(path):
+    """ml_model.joblib -> ml_model.npz"""
+    return os.path.splitext(path)[0] + FLAT_FOREST_SUFFIX
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FlatForest:
+    """
+    A fitted RandomForestRegressor flattened into contiguous arrays, with a
+    NumPy predictor that gives bit-identical results without sklearn.
+
+    All trees share one node table. Leaves point to themselves, so every
+    sample can take `max_depth` steps through every tree at once without
+    masking. Inputs are rounded to float32 before comparing, as sklearn does,
+    and tree outputs are summed in tree order before dividing, matching
+    sklearn's sequential accumulation.
+
+    Only the position of a value among a feature's split thresholds affects
+    the result. When the thresholds cut the input space into few enough
+    cells, the prediction for every cell is computed once and predict() is a
+    table lookup. Otherwise rows are reduced to their cell and only distinct
+    cells are walked through the trees; a planner horizon repeats the same
+    subject features with a days_to_deadline the trees only split on a few
+    weeks out, so that is usually a small fraction of rows.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features, table=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        internal = left != np.arange(len(left))
+        self.split_values = [np.unique(threshold[internal & (feature == j)]) for j in range(self.n_features_in_)]
+        self.n_cells = 1
+        for values in self.split_values:
+            self.n_cells *= len(values) + 1
+        self.cell_weights = np.cumprod([1] + [len(v) + 1 for v in self.split_values[:-1]], dtype=np.int64)
+        self.table = table if table is not None and len(table) == self.n_cells else None
+        if self.table is None and self.n_cells <= LOOKUP_MAX_CELLS:
+            self.table = self._build_table()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a single-output RandomForestRegressor; None for anything else."""
+        estimators = getattr(model, "estimators_", None)
+        if not estimators or getattr(model, "n_outputs_", 1) != 1:
+            return None
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for est in estimators:
+            tree = est.tree_
+            n = tree.node_count
+            ids = np.arange(n, dtype=np.int32)
+            leaf = tree.children_left == _LEAF
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold).astype(np.float64))
+            lefts.append(np.where(leaf, ids, tree.children_left).astype(np.int32) + offset)
+            rights.append(np.where(leaf, ids, tree.children_right).astype(np.int32) + offset)
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights), np.concatenate(values),
+            np.asarray(roots, dtype=np.int32), max_depth, model.n_features_in_
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        arrays = (self.feature, self.threshold, self.left, self.right, self.value, self.roots, self.table)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"expected {self.n_features_in_} features, got {X.shape}")
+        codes = self._cell_codes(X)
+        if self.table is not None:
+            return self.table[codes @ self.cell_weights]
+        if self.n_cells < 2 ** 62:
+            _, first, inverse = np.unique(codes @ self.cell_weights, return_index=True, return_inverse=True)
+        else:
+            _, first, inverse = np.unique(codes, axis=0, return_index=True, return_inverse=True)
+        return self._walk(X[first])[inverse.ravel()]
+
+    def _cell_codes(self, X):
+        """Per feature, the number of split thresholds strictly below the value."""
+        codes = np.empty(X.shape, dtype=np.int64)
+        for j, values in enumerate(self.split_values):
+            codes[:, j] = np.searchsorted(values, X[:, j].astype(np.float64), side="left")
+        return codes
+
+    def _build_table(self):
+        """Prediction for every cell, from one float32 representative per cell."""
+        axes = []
+        for values in self.split_values:
+            # The largest float32 not above each threshold lands in that
+            # threshold's bin; one step above the last covers the top bin.
+            reps = values.astype(np.float32)
+            reps = np.where(reps > values, np.nextafter(reps, np.float32(-np.inf)), reps)
+            top = np.nextafter(reps[-1], np.float32(np.inf)) if len(reps) else np.float32(0)
+            axes.append(np.append(reps, top).astype(np.float32))
+        grid = np.stack([g.ravel() for g in np.meshgrid(*axes, indexing="ij")], axis=1)
+        codes = self._cell_codes(grid)
+        table = np.empty(self.n_cells, dtype=np.float64)
+        table[codes @ self.cell_weights] = self._walk(grid)
+        if len(np.unique(codes @ self.cell_weights)) != self.n_cells:
+            return None
+        return table
+
+    def _walk(self, X):
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+            out[start:start + PREDICT_CHUNK_ROWS] = self._predict_chunk(X[start:start + PREDICT_CHUNK_ROWS])
+        return out
+
+    def _predict_chunk(self, X):
+        flat = X.ravel()
+        base = (np.arange(len(X), dtype=np.int64) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = flat.take(base + self.feature.take(node)) <= self.threshold.take(node)
+            node = np.where(go_left, self.left.take(node), self.right.take(node))
+        leaf_values = self.value.take(node)
+        total = np.zeros(len(X), dtype=np.float64)
+        for t in range(leaf_values.shape[1]):
+            total += leaf_values[:, t]
+        return total / leaf_values.shape[1]
+
+    def save(self, path, columns, **meta):
+        """
+        Write the arrays plus feature columns and metadata atomically to
+        `path`. Pass source_sha256 of the .joblib it came from so loaders can
+        tell when the two no longer match.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".ml_model-", suffix=".npz.tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(
+                    fh, feature=self.feature, threshold=self.threshold, left=self.left,
+                    right=self.right, value=self.value, roots=self.roots,
+                    max_depth=self.max_depth, n_features=self.n_features_in_,
+                    table=self.table if self.table is not None else np.empty(0),
+                    columns=np.asarray(columns, dtype=str),
+                    version=np.int64(meta.get("version") or 0),
+                    trained_at=np.asarray(meta.get("trained_at") or "", dtype=str),
+                    source_sha256=np.asarray(meta.get("source_sha256") or "", dtype=str),
+                )
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+
+def load_flat_payload(path):
+    """Load a .npz written by FlatForest.save as a registry payload dict."""
+    with np.load(path, allow_pickle=False) as data:
+        model = FlatForest(
+            data["feature"], data["threshold"], data["left"], data["right"], data["value"],
+            data["roots"], data["max_depth"], data["n_features"],
+            table=data["table"] if "table" in data.files and data["table"].size else None
+        )
+        return {
+            "model": model,
+            "columns": data["columns"].tolist(),
+            "version": int(data["version"]) or None,
+            "trained_at": str(data["trained_at"]) or None,
+            "source_sha256": str(data["source_sha256"]) if "source_sha256" in data.files else None,
+        }
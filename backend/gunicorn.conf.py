@@ -0,0 +1,33 @@
+"""
+Pre-forking production server: the master imports the app and loads the
+global model once, then forks the workers, which share those pages
+copy-on-write instead of each importing and loading on its own.
+
+    gunicorn -c gunicorn.conf.py      # from backend/; HOST, PORT, WEB_WORKERS
+"""
+import gc
+import os
+
+wsgi_app = os.environ.get("GUNICORN_APP", "asgi:application")
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1))
+preload_app = True
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def when_ready(server):
+    from app import warm_up
+    warm_up()
+    # Move everything loaded so far out of the collector's generations, so
+    # collections in the workers do not write to (and un-share) those pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Pooled connections opened by the master must not be shared; drop them
+    # without closing the sockets the master still owns.
+    from app import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
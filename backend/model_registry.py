@@ -0,0 +1,224 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flat_forest import ENABLE_FLAT_FOREST, file_sha256, flat_path, load_flat_payload
+
+MODEL_PATH = os.environ.get(
+    "STUDYPLANNER_MODEL_PATH",
+    os.path.join(os.path.dirname(__file__), "ml_model.joblib")
+)
+USER_MODEL_DIR = os.environ.get(
+    "STUDYPLANNER_USER_MODEL_DIR",
+    os.path.join(os.path.dirname(__file__), "user_models")
+)
+MODEL_CACHE_MAX_BYTES = int(float(os.environ.get("MODEL_CACHE_MAX_MB", 512)) * 1024 * 1024)
+
+
+def user_model_path(user_id):
+    return os.path.join(USER_MODEL_DIR, f"user_{int(user_id)}.joblib")
+
+
+def save_artifact(payload, path=MODEL_PATH):
+    """
+    Write a model payload next to `path` and atomically move it into place,
+    so readers only ever see the previous or the new complete file.
+    """
+    import joblib
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".ml_model-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            joblib.dump(payload, fh)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class _Entry:
+    __slots__ = ("signature", "model", "columns", "version", "trained_at", "nbytes")
+
+    def __init__(self, signature, payload, nbytes):
+        self.signature = signature
+        self.model = payload.get("model")
+        self.columns = payload.get("columns", [])
+        self.version = payload.get("version") or signature[0]
+        self.trained_at = payload.get("trained_at")
+        self.nbytes = nbytes
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of trained models and their feature columns.
+
+    The global model is always kept. Per-user models share an LRU budget of
+    `max_bytes`, measured by artifact size on disk. An artifact is only
+    unpickled again when its mtime, size or inode changes. When a flattened
+    forest (.npz) exported from the same .joblib sits next to it, that is
+    served instead, so requests never need sklearn. Artifacts are read
+    outside the registry lock, one load per path at a time, so a slow load
+    never holds up requests served by other models.
+    """
+
+    def __init__(self, path=MODEL_PATH, max_bytes=MODEL_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._load_locks = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+        self.last_load_seconds = None
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _drop(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None and path != self.path:
+            self._bytes -= entry.nbytes
+        return entry
+
+    def _evict(self):
+        for path in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if path == self.path:
+                continue
+            self._drop(path)
+            self._load_locks.pop(path, None)
+            self.evictions += 1
+
+    def _load(self, path, flat):
+        """(payload, bytes on disk); the flattened forest when it matches the .joblib."""
+        if flat is not None:
+            payload = load_flat_payload(flat)
+            if not os.path.exists(path) or payload.get("source_sha256") == file_sha256(path):
+                return payload, os.path.getsize(flat)
+        # Only the sklearn fallback needs joblib (and, through the pickle,
+        # sklearn itself); keep both out of workers serving the .npz.
+        import joblib
+        return joblib.load(path), os.path.getsize(path)
+
+    def _signature(self, path):
+        """(signature, flattened forest path or None); the signature is None when neither file exists."""
+        flat = flat_path(path) if ENABLE_FLAT_FOREST else None
+        joblib_signature = self._stat(path)
+        flat_signature = self._stat(flat) if flat else None
+        if flat_signature is None:
+            flat = None
+        if joblib_signature is None and flat_signature is None:
+            return None, None
+        # Either file changing means the artifact has to be re-checked.
+        return (joblib_signature or ()) + (flat_signature or ()), flat
+
+    def _cached(self, path, signature):
+        """(entry, current); call with self._lock held. Drops the entry when the files are gone."""
+        if signature is None:
+            self._drop(path)
+            self._load_locks.pop(path, None)
+            return None, True
+        entry = self._entries.get(path)
+        if entry is not None and entry.signature == signature:
+            self.hits += 1
+            self._entries.move_to_end(path)
+            return entry, True
+        return entry, False
+
+    def _resolve(self, path):
+        signature, flat = self._signature(path)
+        with self._lock:
+            entry, current = self._cached(path, signature)
+            if current:
+                return entry
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+
+        with load_lock:
+            # Whoever held the load lock may have loaded this version already.
+            signature, flat = self._signature(path)
+            with self._lock:
+                entry, current = self._cached(path, signature)
+                if current:
+                    return entry
+                self.misses += 1
+
+            started = time.perf_counter()
+            try:
+                payload, nbytes = self._load(path, flat)
+            except Exception:
+                with self._lock:
+                    self.load_errors += 1
+                return entry
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self.last_load_seconds = elapsed
+                self.loads += 1
+                self._drop(path)
+                entry = _Entry(signature, payload, nbytes)
+                self._entries[path] = entry
+                if path != self.path:
+                    self._bytes += entry.nbytes
+                    self._evict()
+            return entry
+
+    def resolve(self, user_id=None):
+        """
+        Return the cache entry that serves `user_id`: their own model when one
+        has been trained, otherwise the global model. None when neither exists.
+        """
+        if user_id is not None:
+            entry = self._resolve(user_model_path(user_id))
+            if entry is not None and entry.model is not None:
+                return entry
+        return self._resolve(self.path)
+
+    def get(self, user_id=None):
+        """
+        Return (model, columns), or (None, None) when no usable artifact exists.
+        """
+        entry = self.resolve(user_id)
+        if entry is None:
+            return None, None
+        return entry.model, entry.columns
+
+    @property
+    def version(self):
+        entry = self._entries.get(self.path)
+        return entry.version if entry else None
+
+    def stats(self):
+        with self._lock:
+            entry = self._entries.get(self.path)
+            return {
+                "path": self.path,
+                "version": entry.version if entry else None,
+                "trained_at": entry.trained_at if entry else None,
+                "loaded": entry is not None and entry.model is not None,
+                "user_models": len(self._entries) - (1 if entry else 0),
+                "user_model_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "load_errors": self.load_errors,
+                "evictions": self.evictions,
+                "last_load_seconds": self.last_load_seconds,
+            }
+
+
+registry = ModelRegistry()
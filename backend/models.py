@@ -1,10 +1,60 @@
 # backend/models.py
+import os
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets the session writer append while requests and training read;
+    synchronous=NORMAL is durable enough in WAL mode and skips an fsync per
+    commit; busy_timeout makes a second writer wait instead of failing.
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def ensure_indexes():
+    """create_all only creates indexes for new tables; add any missing ones."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def ensure_columns():
+    """
+    create_all never alters existing tables; add nullable columns introduced
+    since a table was created with a plain ALTER TABLE ... ADD COLUMN.
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
 class User(UserMixin, db.Model):
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
@@ -18,12 +68,16 @@ class User(UserMixin, db.Model):
 
 class Timetable(db.Model):
     __tablename__ = "timetables"
+    # Backs the dashboard listing: newest first per user, keyset-paginated.
+    __table_args__ = (db.Index("ix_timetables_user_created", "user_id", "created_at", "id"),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     variant = db.Column(db.String(64), nullable=True)
     title = db.Column(db.String(200), nullable=True)
     data = db.Column(db.JSON, nullable=False)
+    # Plan arguments and units-consumed checkpoints for incremental reschedule (see replan.py).
+    plan_state = db.Column(db.JSON, nullable=True)
 
     user = db.relationship("User", backref="timetables")
 
@@ -33,6 +87,8 @@ class SessionHistory(db.Model):
     Each record represents one session (a continuous study of a subject).
     """
     __tablename__ = "session_history"
+    # Per-user training reads (user_id, id > watermark) in id order.
+    __table_args__ = (db.Index("ix_session_history_user_id", "user_id", "id"),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
     subject = db.Column(db.String(200), nullable=False)
@@ -42,6 +98,33 @@ class SessionHistory(db.Model):
     syllabus_size = db.Column(db.Float, nullable=True)
     days_to_deadline = db.Column(db.Integer, nullable=True)
     task_type = db.Column(db.String(50), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # "recorded" for sessions logged through /api/record_session, "generated"
+    # for planned slots; NULL on rows written before the column existed.
+    source = db.Column(db.String(16), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    user = db.relationship("User", backref="sessions")
+
 
-    user = db.relationship("User", backref="sessions")
\ No newline at end of file
+class SessionRollup(db.Model):
+    """
+    Generated session_history rows folded together by compaction.py: one row
+    per user, source and distinct set of model inputs (with the training
+    loader's defaults applied), holding how many sessions it stands for and
+    their mean hours. Training uses it as samples weighted by session_count.
+    """
+    __tablename__ = "session_rollup"
+    __table_args__ = (db.Index("ix_session_rollup_user", "user_id"),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    source = db.Column(db.String(16), nullable=True)
+    difficulty = db.Column(db.Integer, nullable=False)
+    importance = db.Column(db.Integer, nullable=False)
+    syllabus_size = db.Column(db.Float, nullable=False)
+    days_to_deadline = db.Column(db.Integer, nullable=False)
+    task_type = db.Column(db.String(50), nullable=False)
+    session_count = db.Column(db.Integer, nullable=False)
+    mean_hours = db.Column(db.Float, nullable=False)
+    # Newest session_history id folded in, so training watermarks stay valid.
+    max_session_id = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,59 @@
+"""
+Spawn-context process pools for the variant, cohort and training workers.
+
+Spawn rather than fork: the web process runs background threads whose locks
+must not be copied into the children. When a worker dies the executor is
+left broken for good, so a pool that raised BrokenProcessPool is dropped
+and the next call starts a fresh one.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class SpawnPool:
+    """A lazily started ProcessPoolExecutor that replaces itself when broken."""
+
+    def __init__(self, workers, initializer=None):
+        self.workers = workers
+        self.initializer = initializer
+        self._executor = None
+        self._executor_workers = 0
+        self._lock = threading.Lock()
+
+    def executor(self, workers=None):
+        """The current executor, started (or restarted with `workers` processes) as needed."""
+        workers = workers or self.workers
+        with self._lock:
+            if self._executor is None or self._executor_workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer
+                )
+                self._executor_workers = workers
+            return self._executor
+
+    def discard(self, executor):
+        """Forget a broken `executor`, unless another caller already replaced it."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def run(self, fn, workers=None, retries=1):
+        """
+        fn(executor), replacing the pool and calling fn again up to `retries`
+        times if a worker dies; BrokenProcessPool is raised after that.
+        """
+        for attempt in range(retries + 1):
+            executor = self.executor(workers)
+            try:
+                return fn(executor)
+            except BrokenProcessPool:
+                self.discard(executor)
+                if attempt == retries:
+                    raise
@@ -0,0 +1,260 @@
+"""
+Incremental rescheduling of saved plans.
+
+A saved Timetable keeps, beside its days, a plan_state: the arguments it was
+planned from, the unit hours of every (subject, day) it was planned with and
+checkpoints of the units each subject has consumed, every CHECKPOINT_DAYS
+days from the plan's first day plus one at every date it was rescheduled
+from. Rescheduling from a date keeps every earlier day exactly
+as saved, restores units_left at that date from the nearest checkpoint and
+the few planned days after it, replaces the planned past with the sessions
+actually recorded since the last reschedule, and runs the engine over the
+remaining window only.
+"""
+import base64
+import bisect
+import os
+import random
+import zlib
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import func, select
+from models import db, SessionHistory
+from model_registry import registry
+from scheduler import (SLOT_MINUTES, DAY_START, _fallback_unit_hours_matrix, _last_deadline,
+                       _normalize_subjects, _predict_unit_hours, _run_engine)
+from timetable_codec import decode_timetable
+from metrics import span
+
+CHECKPOINT_DAYS = int(os.environ.get("PLAN_CHECKPOINT_DAYS", 7))
+PLAN_STATE_VERSION = 1
+_PLAN_KEYS = ("subjects", "daily_hours", "schedule_type", "unavailable_dates", "limit_weekends",
+              "slot_minutes", "day_start")
+
+
+class NoPlanState(ValueError):
+    """The timetable was saved without the plan it came from."""
+
+
+def _predicted(norm, start, num_days, user_id):
+    """Model unit hours for (subjects x days), or None without a usable model."""
+    with span("model_load", path="replan"):
+        entry = registry.resolve(user_id)
+    if entry is None:
+        return None
+    with span("predict", path="replan"):
+        return _predict_unit_hours(entry.model, entry.columns, norm, start, num_days)
+
+
+def _unit_hours(norm, start, num_days, user_id):
+    """Like _predicted, falling back to the heuristic (with a fixed seed) when there is no model."""
+    values = _predicted(norm, start, num_days, user_id)
+    if values is None:
+        values = _fallback_unit_hours_matrix(norm, start, num_days, random.Random(0))
+    return values
+
+
+def _pack_matrix(values):
+    """A (subjects x days) float array as zlib-compressed, base64-encoded little-endian float32."""
+    raw = np.ascontiguousarray(values, dtype="<f4").tobytes()
+    return base64.b64encode(zlib.compress(raw)).decode("ascii")
+
+
+def _unpack_matrix(text, rows):
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype="<f4").reshape(rows, -1).astype(float)
+
+
+def _saved_unit_hours(state, first, last, user_id):
+    """The unit hours the saved plan used on day offsets first <= d < last, per state["names"]."""
+    if state.get("daily_unit_hours"):
+        return _unpack_matrix(state["daily_unit_hours"], len(state["names"]))[:, first:last]
+    # States saved before the matrix was kept: predict the days again.
+    norm = _normalize_subjects(state["plan"]["subjects"])
+    return _unit_hours(norm, date.fromisoformat(state["start"]) + timedelta(days=first), last - first, user_id)
+
+
+def _consumed(timetable, names, start, num_days, unit_hours):
+    """(subjects x days) units consumed by the planned hours of num_days days from start."""
+    index = {name: i for i, name in enumerate(names)}
+    hours = np.zeros((len(names), num_days))
+    for d in range(num_days):
+        for slot in timetable.get((start + timedelta(days=d)).isoformat(), ()):
+            i = index.get(slot.get("subject"))
+            if i is not None:
+                hours[i, d] += float(slot.get("hours") or 0.0)
+    return hours / unit_hours
+
+
+def _checkpoint_rows(base, consumed, first, step):
+    """
+    (day offset, cumulative consumed) pairs every `step` days of the plan from
+    day offset `first` (inclusive) to the end of `consumed`, whose column 0
+    is day `first` and which starts from `base`.
+    """
+    cum = base[:, None] + np.concatenate([np.zeros((len(base), 1)), np.cumsum(consumed, axis=1)], axis=1)
+    rows = [(first, cum[:, 0])]
+    for offset in range(-(-first // step) * step, first + consumed.shape[1] + 1, step):
+        if offset > first:
+            rows.append((offset, cum[:, offset - first]))
+    return rows
+
+
+def _rounded(values):
+    return [round(float(v), 4) for v in values]
+
+
+def _state(kwargs, names, start, num_days, checkpoints, unit_hours, daily, anchor_day):
+    """
+    checkpoints holds (day offset, consumed per name) pairs, as arrays or
+    already-rounded lists; daily is the (names x num_days) unit hours matrix.
+    """
+    return {
+        "version": PLAN_STATE_VERSION,
+        "plan": {k: kwargs[k] for k in _PLAN_KEYS if k in kwargs},
+        "names": names,
+        "start": start.isoformat(),
+        "days": num_days,
+        "offsets": [offset for offset, _ in checkpoints],
+        "consumed": [values if isinstance(values, list) else _rounded(values) for _, values in checkpoints],
+        "unit_hours": _rounded(unit_hours.mean(axis=1)),
+        "daily_unit_hours": _pack_matrix(daily[:, :num_days]),
+        "anchor": {"day": anchor_day, "at": datetime.utcnow().isoformat()},
+    }
+
+
+def plan_state(kwargs, timetable, unit_hours=None):
+    """
+    The plan_state to save with `timetable`, planned from the create_timetable
+    keyword arguments `kwargs`. `unit_hours` may pass the (subjects x days)
+    predictions the plan was made with; otherwise they are predicted again.
+    Returns None for an empty plan.
+    """
+    norm = _normalize_subjects(kwargs.get("subjects") or [])
+    if not norm or not timetable or timetable.get("_fmt"):
+        return None
+    try:
+        days = sorted(date.fromisoformat(d) for d in timetable)
+    except (TypeError, ValueError):
+        return None
+    start = days[0]
+    num_days = (days[-1] - start).days + 1
+    if unit_hours is None or np.shape(unit_hours) != (len(norm), num_days):
+        unit_hours = _unit_hours(norm, start, num_days, kwargs.get("user_id"))
+    names = [s["name"] for s in norm]
+    consumed = _consumed(timetable, names, start, num_days, unit_hours)
+    checkpoints = _checkpoint_rows(np.zeros(len(names)), consumed, 0, CHECKPOINT_DAYS)
+    return _state(kwargs, names, start, num_days, checkpoints, unit_hours, unit_hours, 0)
+
+
+def _consumed_at(state, timetable, day, user_id):
+    """Units consumed per state["names"] before `day`: the last checkpoint plus the planned days since."""
+    start = date.fromisoformat(state["start"])
+    target = max(0, min((day - start).days, state["days"]))
+    k = bisect.bisect_right(state["offsets"], target) - 1
+    offset = state["offsets"][k]
+    consumed = np.array(state["consumed"][k], dtype=float)
+    if target > offset:
+        since = start + timedelta(days=offset)
+        unit_hours = _saved_unit_hours(state, offset, target, user_id)
+        consumed += _consumed(timetable, state["names"], since, target - offset, unit_hours).sum(axis=1)
+    return consumed
+
+
+def recorded_hours(user_id, since):
+    """Hours per subject from sessions the user recorded at or after `since`."""
+    rows = db.session.execute(
+        select(SessionHistory.subject, func.sum(SessionHistory.actual_hours))
+        .where(SessionHistory.user_id == user_id,
+               SessionHistory.source == "recorded",
+               SessionHistory.created_at >= since)
+        .group_by(SessionHistory.subject)
+    ).all()
+    return {subject: float(hours) for subject, hours in rows}
+
+
+def reschedule_saved(tt, kwargs, from_date, variant, user_id):
+    """
+    Replan saved Timetable `tt` from `from_date` (never before today) with
+    the create_timetable keyword arguments `kwargs`. Days before from_date
+    are kept as saved. Units consumed by then come from the checkpoints; if
+    the user recorded sessions since the plan was last anchored, those hours
+    replace the planned ones for the days already past. Subjects are matched
+    by name, so kwargs may add, drop or resize subjects.
+
+    Returns (timetable, window, plan_state): the merged plan, the recomputed
+    days only, and the state to store with the merged plan. Needs an app
+    context; raises NoPlanState or InfeasibleTimetable.
+    """
+    state = tt.plan_state
+    if not state or state.get("version") != PLAN_STATE_VERSION:
+        raise NoPlanState("timetable was saved without its plan; reschedule from the form instead")
+    saved = decode_timetable(tt.data)
+    start = date.fromisoformat(state["start"])
+    today = max(datetime.now().date(), start)
+    from_date = max(from_date or today, today)
+    names = state["names"]
+
+    consumed = _consumed_at(state, saved, from_date, user_id)
+    recorded = recorded_hours(user_id, datetime.fromisoformat(state["anchor"]["at"]))
+    if recorded:
+        known = min(start + timedelta(days=state["anchor"]["day"]), today)
+        planned_past = _consumed_at(state, saved, today, user_id) - _consumed_at(state, saved, known, user_id)
+        actual = np.array([recorded.get(name, 0.0) for name in names]) / np.array(state["unit_hours"])
+        consumed = consumed - planned_past + actual
+    done = dict(zip(names, consumed.tolist()))
+
+    norm = _normalize_subjects(kwargs["subjects"])
+    for s in norm:
+        s["units_left"] = float(min(s["units_total"], max(0.0, s["units_total"] - done.get(s["name"], 0.0))))
+    base = np.array([s["units_total"] - s["units_left"] for s in norm], dtype=float)
+    from_iso = from_date.isoformat()
+    frozen = {day: slots for day, slots in saved.items() if day < from_iso}
+
+    window, unit_hours = {}, None
+    if norm:
+        last_deadline = _last_deadline(norm, from_date)
+        num_days = (last_deadline - from_date).days + 1
+        rng = random.Random(int(variant))
+        unit_hours = _predicted(norm, from_date, num_days, user_id)
+        if unit_hours is None:
+            # Draw the fallback here so the engine and the checkpoints use the same values.
+            unit_hours = _fallback_unit_hours_matrix(norm, from_date, num_days, rng)
+        window = _run_engine(
+            norm, kwargs["daily_hours"], kwargs.get("schedule_type", "daily"),
+            kwargs.get("unavailable_dates") or [], kwargs.get("limit_weekends", False),
+            from_date, last_deadline, unit_hours, rng,
+            kwargs.get("slot_minutes", SLOT_MINUTES), kwargs.get("day_start", DAY_START)
+        )
+    timetable = {**frozen, **window}
+
+    # Carry the checkpoints before from_date over to the new subject list,
+    # then checkpoint the recomputed window starting from the corrected units.
+    first = (from_date - start).days
+    new_names = [s["name"] for s in norm]
+    old_index = {name: i for i, name in enumerate(names)}
+    same = new_names == names
+    checkpoints = [
+        (offset, values if same else [values[old_index[n]] if n in old_index else 0.0 for n in new_names])
+        for offset, values in zip(state["offsets"], state["consumed"]) if offset < first
+    ]
+    if window:
+        consumed_window = _consumed(window, new_names, from_date, unit_hours.shape[1], unit_hours)
+        checkpoints += _checkpoint_rows(base, consumed_window, first, CHECKPOINT_DAYS)
+        per_unit = unit_hours
+    else:
+        checkpoints.append((first, base))
+        per_unit = np.ones((len(norm), 1))
+    last_day = date.fromisoformat(max(window or frozen)) if timetable else from_date
+    num_days = (last_day - start).days + 1
+    # Unit hours per day: as saved before from_date, as planned from then on;
+    # days no plan covers (and new subjects before from_date) hold 1.0.
+    daily = np.ones((len(new_names), max(num_days, first + per_unit.shape[1])))
+    if first > 0:
+        old = _saved_unit_hours(state, 0, min(first, state["days"]), user_id)
+        for i, name in enumerate(new_names):
+            if name in old_index:
+                daily[i, :old.shape[1]] = old[old_index[name]]
+    if window:
+        daily[:, first:first + per_unit.shape[1]] = per_unit
+    new_state = _state(kwargs, new_names, start, num_days, checkpoints, per_unit, daily, first)
+    return timetable, window, new_state
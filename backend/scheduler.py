@@ -1,8 +1,53 @@
 from datetime import datetime, timedelta
-import random, os, joblib
+import heapq
+import random
+import numpy as np
 from typing import List, Dict, Any, Optional
+from model_registry import registry
+from timetable_cache import cache_key, timetable_cache
+from metrics import span
+
+SLOT_MINUTES = 30
+DAY_START = "09:00"
+STUDY_SLOTS_BEFORE_BREAK = 3
+FREE_SLOT = -1
+BREAK_SLOT = -2
+# The "horizon" engine allocates whole multiples of this many hours.
+HORIZON_QUANTUM = 0.25
+# iter_timetable predicts this many days at a time for the day-by-day engines.
+STREAM_PREDICT_DAYS = 14
+_STREAMING_ENGINES = ("daily", "alternate")
+
+
+class InfeasibleTimetable(ValueError):
+    """
+    The subjects cannot all be finished by their deadlines in the hours
+    available. `deadline` is the first date where the hours needed by every
+    subject due by then exceed the open hours up to then.
+    """
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "ml_model.joblib")
+    def __init__(self, deadline, required_hours, available_hours, subjects):
+        self.deadline = deadline
+        self.required_hours = float(required_hours)
+        self.available_hours = float(available_hours)
+        self.subjects = list(subjects)
+        super().__init__(
+            f"Not enough study time: {len(self.subjects)} subject(s) due by {deadline.isoformat()} "
+            f"need {self.required_hours:g} h but only {self.available_hours:g} h are available"
+        )
+
+    def __reduce__(self):
+        # Rebuild from the fields when raised in a variant pool worker.
+        return type(self), (self.deadline, self.required_hours, self.available_hours, self.subjects)
+
+    def to_dict(self):
+        return {
+            "error": str(self),
+            "deadline": self.deadline.isoformat(),
+            "required_hours": self.required_hours,
+            "available_hours": self.available_hours,
+            "subjects": self.subjects,
+        }
 
 def _to_date(dstr: Optional[str]):
     if not dstr: return None
@@ -17,16 +62,9 @@ def _to_date(dstr: Optional[str]):
 def _round2(x: float) -> float:
     return round(x + 1e-9, 2)
 
-def _load_model():
-    if os.path.exists(MODEL_PATH):
-        try:
-            payload = joblib.load(MODEL_PATH)
-            model = payload.get("model")
-            columns = payload.get("columns", [])
-            return model, columns
-        except Exception:
-            return None, None
-    return None, None
+def _load_model(user_id=None):
+    with span("model_load"):
+        return registry.get(user_id)
 
 def _featurize_for_model(subject: Dict[str, Any], days_to_deadline: int, task_types_columns: List[str]):
     """
@@ -42,25 +80,236 @@ def _featurize_for_model(subject: Dict[str, Any], days_to_deadline: int, task_ty
         base[col] = 1 if subject.get("task_type", "") == col.replace("task_", "") else 0
     return base
 
+def _predict_unit_hours(model, model_columns: List[str], subjects: List[Dict[str, Any]], start, num_days: int):
+    """
+    Predict unit hours for every (subject, day) pair of the horizon in one batch.
+    Returns a (subjects x days) array clipped to [0.25, 4.0], or None when the
+    model is unavailable or prediction fails.
+    """
+    X = _feature_rows(model, model_columns, subjects, start, num_days)
+    if X is None:
+        return None
+    try:
+        preds = np.asarray(model.predict(X), dtype=float)
+    except Exception:
+        return None
+    return np.clip(preds, 0.25, 4.0).reshape(len(subjects), num_days)
+
+def _feature_rows(model, model_columns: List[str], subjects: List[Dict[str, Any]], start, num_days: int):
+    """
+    The (subjects x days) x columns feature matrix behind _predict_unit_hours,
+    subject-major, or None when there is nothing to predict.
+    """
+    if model is None or not model_columns or not subjects or num_days <= 0:
+        return None
+    task_columns = [c for c in model_columns if c.startswith("task_")]
+    try:
+        days_col = model_columns.index("days_to_deadline")
+    except ValueError:
+        days_col = None
+
+    base = np.empty((len(subjects), len(model_columns)), dtype=float)
+    days_left = np.empty((len(subjects), num_days), dtype=float)
+    offsets = np.arange(num_days)
+    for i, s in enumerate(subjects):
+        feat = _featurize_for_model(s, 0, task_columns)
+        base[i] = [feat.get(col, 0.0) for col in model_columns]
+        if s["deadline"]:
+            days_left[i] = (s["deadline"] - start).days - offsets
+        else:
+            days_left[i] = 30
+
+    X = np.repeat(base, num_days, axis=0)
+    if days_col is not None:
+        X[:, days_col] = days_left.ravel()
+    return X
+
+def _fallback_unit_hours(s: Dict[str, Any], current, rng) -> float:
+    """
+    Heuristic unit hours used when no model is available.
+    """
+    base = 0.9 + (s["difficulty"] * 0.2) + (s["importance"] * 0.15)
+    if s["deadline"]:
+        days_left = (s["deadline"] - current).days
+        if days_left <= 0:
+            urgency = 1.5
+        else:
+            urgency = 1.0 + max(0.0, (30 - min(30, days_left))) / 40.0
+    else:
+        urgency = 1.0
+    predicted_unit_hours = base * urgency * rng.uniform(0.9, 1.15)
+    return max(0.25, min(predicted_unit_hours, 4.0))
+
 def create_timetable(
     subjects: List[Dict[str, Any]],
     daily_hours: float,
     schedule_type: str = "daily",
     unavailable_dates: Optional[List[str]] = None,
     variant: Optional[int] = None,
-    limit_weekends: bool = False
+    limit_weekends: bool = False,
+    user_id: Optional[int] = None,
+    slot_minutes: int = SLOT_MINUTES,
+    day_start: str = DAY_START,
+    cache: bool = True
 ) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Plan `subjects` from today. Plans for an explicit variant are kept in
+    timetable_cache unless `cache` is False, which callers pass for variants
+    no one will ask for again (such as a server-chosen reschedule seed).
+    """
 
     if unavailable_dates is None:
         unavailable_dates = []
 
+    with span("model_load"):
+        entry = registry.resolve(user_id)
+    model, model_columns = (entry.model, entry.columns) if entry else (None, None)
+
+    if variant is None or not cache:
+        variant = int(datetime.now().timestamp() * 1000) if variant is None else variant
+        return _build_timetable(subjects, daily_hours, schedule_type, unavailable_dates, variant,
+                                limit_weekends, model, model_columns, slot_minutes, day_start)
+
+    key = _timetable_key(entry, subjects, daily_hours, schedule_type, unavailable_dates, variant,
+                         limit_weekends, slot_minutes, day_start)
+    timetable = timetable_cache.get(key)
+    if timetable is None:
+        timetable = _build_timetable(subjects, daily_hours, schedule_type, unavailable_dates, variant,
+                                     limit_weekends, model, model_columns, slot_minutes, day_start)
+        timetable_cache.put(key, timetable)
+    return {day: [dict(slot) for slot in slots] for day, slots in timetable.items()}
+
+def _timetable_key(entry, subjects, daily_hours, schedule_type, unavailable_dates, variant,
+                   limit_weekends, slot_minutes, day_start):
+    # With an explicit variant the result is a pure function of these inputs.
+    return cache_key(
+        subjects=subjects,
+        daily_hours=float(daily_hours),
+        schedule_type=schedule_type,
+        unavailable_dates=sorted(str(d) for d in unavailable_dates),
+        variant=int(variant),
+        limit_weekends=bool(limit_weekends),
+        slots=[int(slot_minutes), day_start] if schedule_type == "slots" else None,
+        model=[entry.version, *entry.signature] if entry else None,
+        today=datetime.now().date().isoformat()
+    )
+
+def iter_timetable(
+    subjects: List[Dict[str, Any]],
+    daily_hours: float,
+    schedule_type: str = "daily",
+    unavailable_dates: Optional[List[str]] = None,
+    variant: Optional[int] = None,
+    limit_weekends: bool = False,
+    user_id: Optional[int] = None,
+    slot_minutes: int = SLOT_MINUTES,
+    day_start: str = DAY_START
+):
+    """
+    Generator form of create_timetable: yields (iso date, slots) in date
+    order, the same days create_timetable returns for the same arguments.
+    "daily" and the alternate modes decide one day at a time and predict
+    unit hours STREAM_PREDICT_DAYS days ahead, so the first day arrives
+    without planning the rest of the horizon; the other engines plan the
+    whole horizon before the first yield. Errors such as InfeasibleTimetable
+    are raised by the first next().
+    """
+    if unavailable_dates is None:
+        unavailable_dates = []
+
+    with span("model_load"):
+        entry = registry.resolve(user_id)
+    model, model_columns = (entry.model, entry.columns) if entry else (None, None)
+
+    key = None
     if variant is None:
         variant = int(datetime.now().timestamp() * 1000)
-    random.seed(int(variant))
+    else:
+        key = _timetable_key(entry, subjects, daily_hours, schedule_type, unavailable_dates, variant,
+                             limit_weekends, slot_minutes, day_start)
+        cached = timetable_cache.get(key)
+        if cached is not None:
+            for day, slots in cached.items():
+                yield day, [dict(slot) for slot in slots]
+            return
+
+    rng = random.Random(int(variant))
+    norm = _normalize_subjects(subjects)
+    today = datetime.now().date()
+    if not norm:
+        days = iter(())
+    elif schedule_type in _STREAMING_ENGINES:
+        last_deadline = _last_deadline(norm, today)
+        unit_hours = _BlockUnitHours(model, model_columns, norm, today, (last_deadline - today).days + 1)
+        if unit_hours.block(0) is None:
+            unit_hours = None
+        unavailable_set = set(d for d in (_to_date(x) for x in unavailable_dates) if d is not None)
+        for i, s in enumerate(norm):
+            s["index"] = i
+        days = _iter_daily(norm, daily_hours, schedule_type, unavailable_set, limit_weekends,
+                           today, last_deadline, unit_hours, rng)
+    else:
+        days = iter(_build_timetable(subjects, daily_hours, schedule_type, unavailable_dates, variant,
+                                     limit_weekends, model, model_columns, slot_minutes, day_start).items())
+
+    timetable = {} if key is not None else None
+    for day, slots in days:
+        if timetable is not None:
+            timetable[day] = [dict(slot) for slot in slots]
+        yield day, slots
+    if timetable is not None:
+        timetable_cache.put(key, timetable)
+
+class _BlockUnitHours:
+    """
+    unit_hours[i, d] for the day-by-day engines, predicted STREAM_PREDICT_DAYS
+    days at a time as the loop reaches them. Each block is the matching slice
+    of what _predict_unit_hours returns for the whole horizon.
+    """
 
-    model, model_columns = _load_model()
-    task_columns = [c for c in (model_columns or []) if c.startswith("task_")] if model_columns else []
+    def __init__(self, model, model_columns, norm, today, num_days):
+        self.model = model
+        self.model_columns = model_columns
+        self.norm = norm
+        self.today = today
+        self.num_days = num_days
+        self._index = None
+        self._values = None
+
+    def block(self, b):
+        if b != self._index:
+            start = b * STREAM_PREDICT_DAYS
+            with span("predict", path="stream"):
+                self._values = _predict_unit_hours(self.model, self.model_columns, self.norm,
+                                                   self.today + timedelta(days=start),
+                                                   min(STREAM_PREDICT_DAYS, self.num_days - start))
+            self._index = b
+        return self._values
+
+    def __getitem__(self, key):
+        i, d = key
+        values = self.block(d // STREAM_PREDICT_DAYS)
+        if values is None:
+            raise RuntimeError("unit hour prediction failed mid-plan")
+        return values[i, d % STREAM_PREDICT_DAYS]
+
+def _build_timetable(subjects, daily_hours, schedule_type, unavailable_dates, variant,
+                     limit_weekends, model, model_columns, slot_minutes=SLOT_MINUTES, day_start=DAY_START):
+    rng = random.Random(int(variant))
+
+    norm = _normalize_subjects(subjects)
+    if not norm:
+        return {}
+
+    today = datetime.now().date()
+    last_deadline = _last_deadline(norm, today)
 
+    with span("predict"):
+        unit_hours = _predict_unit_hours(model, model_columns, norm, today, (last_deadline - today).days + 1)
+    return _run_engine(norm, daily_hours, schedule_type, unavailable_dates, limit_weekends,
+                       today, last_deadline, unit_hours, rng, slot_minutes, day_start)
+
+def _normalize_subjects(subjects):
     norm = []
     for s in subjects:
         name = str(s.get("name","")).strip()
@@ -82,20 +331,45 @@ def create_timetable(
             "task_type": s.get("task_type"),
             "weight": weight
         })
+    return norm
 
-    if not norm:
-        return {}
-
-    unavailable_set = set(d for d in (_to_date(x) for x in unavailable_dates) if d is not None)
-
-    today = datetime.now().date()
+def _last_deadline(norm, today):
     deadlines = [s["deadline"] for s in norm if s["deadline"]]
     if deadlines:
-        last_deadline = max(max(deadlines), today + timedelta(days=7))
-    else:
-        last_deadline = today + timedelta(days=30)
+        return max(max(deadlines), today + timedelta(days=7))
+    return today + timedelta(days=30)
 
-    timetable: Dict[str, List[Dict[str, Any]]] = {}
+def _run_engine(norm, daily_hours, schedule_type, unavailable_dates, limit_weekends,
+                today, last_deadline, unit_hours, rng, slot_minutes=SLOT_MINUTES, day_start=DAY_START):
+    """Dispatch normalized subjects and their predicted unit hours to the schedule_type's engine."""
+    unavailable_set = set(d for d in (_to_date(x) for x in unavailable_dates) if d is not None)
+    for i, s in enumerate(norm):
+        s["index"] = i
+
+    with span("schedule", schedule_type=schedule_type):
+        if schedule_type == "horizon":
+            return _schedule_horizon(norm, daily_hours, unavailable_set, limit_weekends,
+                                     today, last_deadline, unit_hours, rng)
+        if schedule_type == "daily_event":
+            return _schedule_event_driven(norm, daily_hours, unavailable_set, limit_weekends,
+                                          today, last_deadline, unit_hours, rng)
+        if schedule_type == "slots":
+            grid = _schedule_slots(norm, daily_hours, unavailable_set, limit_weekends,
+                                   today, last_deadline, unit_hours, rng, slot_minutes, day_start)
+            return slots_to_timetable(grid, [s["name"] for s in norm], today, slot_minutes, day_start)
+        return _schedule_daily(norm, daily_hours, schedule_type, unavailable_set, limit_weekends,
+                               today, last_deadline, unit_hours, rng)
+
+
+def _schedule_daily(norm, daily_hours, schedule_type, unavailable_set, limit_weekends,
+                    today, last_deadline, unit_hours, rng):
+    """The original day-by-day loop behind "daily" and the alternate modes."""
+    return dict(_iter_daily(norm, daily_hours, schedule_type, unavailable_set, limit_weekends,
+                            today, last_deadline, unit_hours, rng))
+
+def _iter_daily(norm, daily_hours, schedule_type, unavailable_set, limit_weekends,
+                today, last_deadline, unit_hours, rng):
+    """_schedule_daily as a generator of (iso date, slots), one day at a time."""
     current = today
     last_subject = None
     EPS = 1e-6
@@ -104,50 +378,32 @@ def create_timetable(
         iso = current.isoformat()
 
         if current in unavailable_set:
-            timetable[iso] = []
+            yield iso, []
             current += timedelta(days=1)
             continue
 
         if limit_weekends and current.weekday() >= 5:
-            timetable[iso] = []
+            yield iso, []
             current += timedelta(days=1)
             continue
 
         active = [s for s in norm if s["units_left"] > EPS]
 
         if not active:
-            timetable[iso] = []
+            yield iso, []
             current += timedelta(days=1)
             continue
 
-        timetable[iso] = []
+        day = []
 
         scored = []
         for s in active:
-            days_to_deadline = (s["deadline"] - current).days if s["deadline"] else 30
-
             predicted_unit_hours = None
-            if model is not None:
-                try:
-                    feat = _featurize_for_model(s, days_to_deadline, task_columns)
-                    x = [feat.get(col, 0.0) for col in model_columns]
-                    predicted_unit_hours = float(model.predict([x])[0])
-                    predicted_unit_hours = max(0.25, min(predicted_unit_hours, 4.0))
-                except Exception:
-                    predicted_unit_hours = None
+            if unit_hours is not None:
+                predicted_unit_hours = float(unit_hours[s["index"], (current - today).days])
 
             if predicted_unit_hours is None:
-                base = 0.9 + (s["difficulty"] * 0.2) + (s["importance"] * 0.15)
-                if s["deadline"]:
-                    days_left = (s["deadline"] - current).days
-                    if days_left <= 0:
-                        urgency = 1.5
-                    else:
-                        urgency = 1.0 + max(0.0, (30 - min(30, days_left))) / 40.0
-                else:
-                    urgency = 1.0
-                predicted_unit_hours = base * urgency * random.uniform(0.9, 1.15)
-                predicted_unit_hours = max(0.25, min(predicted_unit_hours, 4.0))
+                predicted_unit_hours = _fallback_unit_hours(s, current, rng)
 
             scored.append((s, predicted_unit_hours))
 
@@ -156,7 +412,7 @@ def create_timetable(
             for s, unit_h in scored:
                 days_to_deadline = (s["deadline"] - current).days if s["deadline"] else 30
                 urgency = 1.0 + max(0.0, (30 - min(30, days_to_deadline))) / 30.0
-                priority = s["weight"] * urgency * random.uniform(0.9, 1.1)
+                priority = s["weight"] * urgency * rng.uniform(0.9, 1.1)
                 scored_priority.append((s, unit_h, priority))
             scored_priority.sort(key=lambda x: x[2], reverse=True)
 
@@ -169,7 +425,7 @@ def create_timetable(
 
                 repeat_penalty = 1.0
                 if s["name"] == last_subject:
-                    repeat_penalty = random.uniform(0.4, 0.8)
+                    repeat_penalty = rng.uniform(0.4, 0.8)
 
                 effective_unit_h = unit_h * repeat_penalty
                 assign = min(effective_unit_h, remaining_daily)
@@ -178,7 +434,7 @@ def create_timetable(
                     continue
 
                 assign_rounded = _round2(assign)
-                timetable[iso].append({"subject": s["name"], "hours": assign_rounded})
+                day.append({"subject": s["name"], "hours": assign_rounded})
                 remaining_daily -= assign
 
                 fraction_consumed = assign / unit_h if unit_h > EPS else 1.0
@@ -189,7 +445,7 @@ def create_timetable(
         else:
             scored_sorted = sorted(scored, key=lambda x: x[1], reverse=True)
             pool = [pair for pair in scored_sorted[:4]] 
-            random.shuffle(pool)
+            rng.shuffle(pool)
             picks = []
             for s, unit_h in pool:
                 if s["units_left"] <= EPS:
@@ -208,13 +464,13 @@ def create_timetable(
                     assign = min(per, unit_h)
                     if assign < 0.25:
                         continue
-                    timetable[iso].append({"subject": s["name"], "hours": _round2(assign)})
+                    day.append({"subject": s["name"], "hours": _round2(assign)})
                     fraction_consumed = assign / unit_h if unit_h > EPS else 1.0
                     s["units_left"] = max(0.0, s["units_left"] - fraction_consumed)
                 last_subject = picks[-1][0]["name"]
 
         merged: Dict[str, float] = {}
-        for slot in timetable[iso]:
+        for slot in day:
             merged[slot["subject"]] = merged.get(slot["subject"], 0.0) + float(slot["hours"])
         day_list = []
         for name, hrs in merged.items():
@@ -222,7 +478,321 @@ def create_timetable(
             if hrs <= 0.0:
                 continue
             day_list.append({"subject": name, "hours": hrs})
-        timetable[iso] = day_list
+        yield iso, day_list
 
         current += timedelta(days=1)
-    return timetable
\ No newline at end of file
+
+def _schedule_event_driven(norm, daily_hours, unavailable_set, limit_weekends,
+                           today, last_deadline, unit_hours, rng):
+    """
+    Deadline-indexed version of the "daily" loop. For the same variant it
+    draws the same random numbers in the same order, so the timetable is
+    identical, but:
+      - blocked days are skipped without touching any subject, and the loop
+        stops once every subject is finished;
+      - the active set is only rebuilt on days a subject runs out of units;
+      - a subject's base priority (weight x urgency) is only recomputed once
+        it is inside its 30-day urgency window, found via a heap on deadline;
+      - the day's jitter and ordering are applied to the whole active set
+        with NumPy instead of scoring and sorting subjects one by one.
+    """
+    EPS = 1e-6
+    num_days = (last_deadline - today).days + 1
+    dates = [today + timedelta(days=d) for d in range(num_days)]
+    timetable: Dict[str, List[Dict[str, Any]]] = {d.isoformat(): [] for d in dates}
+    open_days = [
+        d for d, day in enumerate(dates)
+        if day not in unavailable_set and not (limit_weekends and day.weekday() >= 5)
+    ]
+
+    n = len(norm)
+    names = [s["name"] for s in norm]
+    weight = np.array([s["weight"] for s in norm], dtype=float)
+    deadline_off = [(s["deadline"] - today).days if s["deadline"] else None for s in norm]
+    units_left = [s["units_left"] for s in norm]
+    base = weight.copy()
+    pending = [(off - 29, i) for i, off in enumerate(deadline_off) if off is not None]
+    heapq.heapify(pending)
+    if unit_hours is None:
+        fallback_base = np.array([0.9 + (s["difficulty"] * 0.2) + (s["importance"] * 0.15) for s in norm])
+        no_deadline = np.array([off is None for off in deadline_off], dtype=bool)
+        fallback_off = np.array([0 if off is None else off for off in deadline_off], dtype=float)
+    urgent = np.empty(0, dtype=np.intp)
+    urgent_off = np.empty(0, dtype=float)
+    active = np.arange(n)
+    rand = rng.random
+    last = None
+
+    for d in open_days:
+        if not len(active):
+            break
+
+        if pending and pending[0][0] <= d:
+            entering = []
+            while pending and pending[0][0] <= d:
+                entering.append(heapq.heappop(pending)[1])
+            urgent = np.concatenate([urgent, entering]).astype(np.intp)
+            urgent_off = np.array([deadline_off[i] for i in urgent], dtype=float)
+        if len(urgent):
+            days_to_deadline = urgent_off - d
+            base[urgent] = weight[urgent] * (1.0 + np.maximum(0.0, 30 - np.minimum(30, days_to_deadline)) / 30.0)
+
+        if unit_hours is None:
+            draws = np.fromiter((rand() for _ in range(len(active))), dtype=float, count=len(active))
+            days_left = fallback_off[active] - d
+            urgency = np.where(days_left <= 0, 1.5,
+                               1.0 + np.maximum(0.0, 30 - np.minimum(30, days_left)) / 40.0)
+            urgency[no_deadline[active]] = 1.0
+            fallback = dict(zip(active.tolist(), np.maximum(
+                0.25, np.minimum(fallback_base[active] * urgency * (0.9 + (1.15 - 0.9) * draws), 4.0)).tolist()))
+
+        jitter = np.fromiter((rand() for _ in range(len(active))), dtype=float, count=len(active))
+        priority = base[active] * (0.9 + (1.1 - 0.9) * jitter)
+        # Stable descending order, matching list.sort(reverse=True) on ties.
+        order = active[np.argsort(-priority, kind="stable")].tolist()
+
+        remaining_daily = float(daily_hours)
+        last_seen = last is None
+        finished = False
+        day_list = []
+        for i in order:
+            if remaining_daily <= 0:
+                break
+            unit_h = fallback[i] if unit_hours is None else float(unit_hours[i, d])
+
+            repeat_penalty = 1.0
+            if i == last:
+                last_seen = True
+                repeat_penalty = 0.4 + (0.8 - 0.4) * rand()
+
+            assign = min(unit_h * repeat_penalty, remaining_daily)
+            if assign < 0.25:
+                if remaining_daily < 0.25:
+                    # Nothing else fits today; only the pending repeat-penalty draw is left.
+                    if not last_seen and units_left[last] > EPS:
+                        rand()
+                    break
+                continue
+
+            day_list.append({"subject": names[i], "hours": _round2(_round2(assign))})
+            remaining_daily -= assign
+            units_left[i] = max(0.0, units_left[i] - (assign / unit_h if unit_h > EPS else 1.0))
+            finished = finished or units_left[i] <= EPS
+            last = i
+            last_seen = True
+
+        timetable[dates[d].isoformat()] = day_list
+        if finished:
+            keep = np.array([units_left[i] > EPS for i in active.tolist()], dtype=bool)
+            active = active[keep]
+            keep = np.array([units_left[i] > EPS for i in urgent.tolist()], dtype=bool)
+            urgent, urgent_off = urgent[keep], urgent_off[keep]
+
+    return timetable
+
+def _fallback_unit_hours_matrix(norm, today, num_days, rng):
+    """_fallback_unit_hours for every (subject, day) of the horizon at once."""
+    base = np.array([0.9 + (s["difficulty"] * 0.2) + (s["importance"] * 0.15) for s in norm])[:, None]
+    due = np.array([(s["deadline"] - today).days if s["deadline"] else 0 for s in norm])[:, None]
+    days_left = due - np.arange(num_days)[None, :]
+    urgency = np.where(days_left <= 0, 1.5, 1.0 + np.maximum(0.0, 30 - np.minimum(30, days_left)) / 40.0)
+    urgency[np.array([s["deadline"] is None for s in norm], dtype=bool)] = 1.0
+    jitter = np.random.default_rng(rng.getrandbits(64)).uniform(0.9, 1.15, size=urgency.shape)
+    return np.clip(base * urgency * jitter, 0.25, 4.0)
+
+def _spread(need, chunk, remaining):
+    """
+    Split `need` quanta over the days of `remaining` in proportion to what is
+    left on each day, in blocks of `chunk` quanta where the free time allows
+    it and single quanta otherwise. Never takes more than a day has left;
+    the caller guarantees sum(remaining) >= need.
+    """
+    blocks = remaining // chunk
+    count = -(-need // chunk)
+    if count > blocks.sum():
+        chunk, blocks, count = 1, remaining, need
+    cum = np.cumsum(blocks)
+    total = int(cum[-1])
+    # Rounded running share of `count`: day d's increment is at most blocks[d].
+    taken = np.diff((count * cum + total // 2) // total, prepend=0) * chunk
+    over = count * chunk - need
+    if over:
+        taken[np.flatnonzero(taken)[-1]] -= over
+    return taken
+
+def _schedule_horizon(norm, daily_hours, unavailable_set, limit_weekends,
+                      today, last_deadline, unit_hours, rng):
+    """
+    Whole-horizon engine. The horizon is a capacity vector (daily_hours on
+    open days, 0 on blackouts and skipped weekends) and each subject a demand
+    of units_left x its mean predicted unit hours over its open days, due by
+    its deadline; both are counted in HORIZON_QUANTUM steps.
+
+    Feasibility is checked up front in earliest-deadline order: for every
+    deadline, the demand due by then must fit in the capacity up to then,
+    otherwise InfeasibleTimetable is raised. Subjects are then placed in the
+    same order, each spread over its window in proportion to the capacity
+    still free on each day, in blocks of about one unit; since earlier
+    subjects only use days inside later subjects' windows, the check
+    guarantees every subject fits. The variant only seeds the fallback unit
+    hours used when there is no model.
+    """
+    num_days = (last_deadline - today).days + 1
+    dates = [today + timedelta(days=d) for d in range(num_days)]
+    open_day = np.array([day not in unavailable_set and not (limit_weekends and day.weekday() >= 5)
+                         for day in dates], dtype=bool)
+    capacity = np.where(open_day, int(float(daily_hours) / HORIZON_QUANTUM + 1e-9), 0).astype(np.int64)
+
+    due = np.array([min(max((s["deadline"] - today).days, 0), num_days - 1) if s["deadline"] else num_days - 1
+                    for s in norm], dtype=np.intp)
+    if unit_hours is None:
+        unit_hours = _fallback_unit_hours_matrix(norm, today, num_days, rng)
+    usable = (np.arange(num_days)[None, :] <= due[:, None]) & open_day[None, :]
+    counts = usable.sum(axis=1)
+    mean_unit = np.where(counts > 0, (unit_hours * usable).sum(axis=1) / np.maximum(counts, 1), unit_hours[:, 0])
+    units_left = np.array([s["units_left"] for s in norm], dtype=float)
+    demand = np.ceil(units_left * mean_unit / HORIZON_QUANTUM - 1e-9).astype(np.int64)
+    chunk = np.maximum(1, np.rint(mean_unit / HORIZON_QUANTUM)).astype(np.int64)
+
+    order = np.argsort(due, kind="stable")
+    cum_capacity = np.cumsum(capacity)
+    short = np.cumsum(demand[order]) > cum_capacity[due[order]]
+    if short.any():
+        cutoff = int(due[order[int(np.argmax(short))]])
+        late = order[due[order] <= cutoff]
+        raise InfeasibleTimetable(
+            dates[cutoff],
+            int(demand[late].sum()) * HORIZON_QUANTUM,
+            int(cum_capacity[cutoff]) * HORIZON_QUANTUM,
+            [norm[i]["name"] for i in late.tolist()],
+        )
+
+    remaining = capacity.copy()
+    plan = np.zeros((len(norm), num_days), dtype=np.int64)
+    for col, i in enumerate(order.tolist()):
+        if demand[i] <= 0:
+            continue
+        end = int(due[i]) + 1
+        taken = _spread(int(demand[i]), int(chunk[i]), remaining[:end])
+        plan[col, :end] = taken
+        remaining[:end] -= taken
+
+    timetable: Dict[str, List[Dict[str, Any]]] = {day.isoformat(): [] for day in dates}
+    isos = list(timetable)
+    names = [norm[i]["name"] for i in order.tolist()]
+    days_idx, cols = np.nonzero(plan.T)
+    for d, c, q in zip(days_idx.tolist(), cols.tolist(), plan[cols, days_idx].tolist()):
+        timetable[isos[d]].append({"subject": names[c], "hours": q * HORIZON_QUANTUM})
+    return timetable
+
+def _parse_clock(value: str) -> int:
+    hours, minutes = str(value).split(":")
+    total = int(hours) * 60 + int(minutes)
+    if not 0 <= total < 24 * 60:
+        raise ValueError(f"invalid time of day: {value}")
+    return total
+
+def _format_clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _schedule_slots(norm, daily_hours, unavailable_set, limit_weekends,
+                    today, last_deadline, unit_hours, rng, slot_minutes, day_start):
+    """
+    Slot-level engine. Each open day gets floor(daily_hours / slot) study
+    slots starting at `day_start`, with a break slot after every
+    STUDY_SLOTS_BEFORE_BREAK consecutive study slots. Subjects are visited
+    in the same priority order as "daily", each taking about one unit's worth
+    of slots per turn, until the day is full. The plan is kept as a (days x slots) int16 array of
+    subject indices, with FREE_SLOT and BREAK_SLOT as markers.
+    """
+    EPS = 1e-6
+    slot_minutes = int(slot_minutes)
+    if not 5 <= slot_minutes <= 240:
+        raise ValueError("slot_minutes must be between 5 and 240")
+    start = _parse_clock(day_start)
+    study_slots = int(float(daily_hours) * 60 // slot_minutes)
+    row_len = study_slots + max(0, study_slots - 1) // STUDY_SLOTS_BEFORE_BREAK
+    while study_slots > 0 and start + row_len * slot_minutes > 24 * 60:
+        study_slots -= 1
+        row_len = study_slots + max(0, study_slots - 1) // STUDY_SLOTS_BEFORE_BREAK
+
+    num_days = (last_deadline - today).days + 1
+    grid = np.full((num_days, row_len), FREE_SLOT, dtype=np.int16)
+    slot_hours = slot_minutes / 60.0
+    last = None
+
+    for d in range(num_days):
+        current = today + timedelta(days=d)
+        if current in unavailable_set or (limit_weekends and current.weekday() >= 5):
+            continue
+        active = [s for s in norm if s["units_left"] > EPS]
+        if not active or study_slots == 0:
+            continue
+
+        scored = []
+        for s in active:
+            unit_h = float(unit_hours[s["index"], d]) if unit_hours is not None else _fallback_unit_hours(s, current, rng)
+            days_to_deadline = (s["deadline"] - current).days if s["deadline"] else 30
+            urgency = 1.0 + max(0.0, (30 - min(30, days_to_deadline))) / 30.0
+            scored.append((s, unit_h, s["weight"] * urgency * rng.uniform(0.9, 1.1)))
+        scored.sort(key=lambda x: x[2], reverse=True)
+
+        row = grid[d]
+        col = studied = run = 0
+        # Go round the priority order until the day's study slots are used up.
+        while studied < study_slots:
+            placed = False
+            for s, unit_h, _ in scored:
+                if studied >= study_slots:
+                    break
+                need = int(np.ceil(s["units_left"] * unit_h / slot_hours - EPS))
+                if need <= 0:
+                    continue
+                want = max(1, int(round(unit_h / slot_hours)))
+                if s["index"] == last:
+                    want = max(1, want // 2)
+                take = min(want, need, study_slots - studied)
+                for _ in range(take):
+                    if run == STUDY_SLOTS_BEFORE_BREAK:
+                        row[col] = BREAK_SLOT
+                        col += 1
+                        run = 0
+                    row[col] = s["index"]
+                    col += 1
+                    run += 1
+                studied += take
+                s["units_left"] = max(0.0, s["units_left"] - take * slot_hours / unit_h)
+                last = s["index"]
+                placed = True
+            if not placed:
+                break
+    return grid
+
+def slots_to_timetable(grid, names: List[str], start_date, slot_minutes: int = SLOT_MINUTES,
+                       day_start: str = DAY_START) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Convert a (days x slots) subject-index grid into the JSON timetable shape,
+    one entry per contiguous block: {subject, hours, start, end}.
+    """
+    start = _parse_clock(day_start)
+    slot_minutes = int(slot_minutes)
+    timetable: Dict[str, List[Dict[str, Any]]] = {}
+    for d in range(grid.shape[0]):
+        row = grid[d]
+        day_list = []
+        if row.size:
+            edges = np.flatnonzero(np.diff(row)) + 1
+            starts = np.concatenate(([0], edges))
+            ends = np.concatenate((edges, [row.size]))
+            for a, b in zip(starts.tolist(), ends.tolist()):
+                idx = int(row[a])
+                if idx < 0:
+                    continue
+                day_list.append({
+                    "subject": names[idx],
+                    "hours": _round2((b - a) * slot_minutes / 60.0),
+                    "start": _format_clock(start + a * slot_minutes),
+                    "end": _format_clock(start + b * slot_minutes),
+                })
+        timetable[(start_date + timedelta(days=d)).isoformat()] = day_list
+    return timetable
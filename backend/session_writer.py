@@ -0,0 +1,151 @@
+import queue
+import threading
+import traceback
+from datetime import datetime
+from models import db, SessionHistory
+from metrics import metrics, span
+
+_session_rows = metrics.counter("session_rows_total", "Generated session rows written to session_history.")
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except Exception:
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except Exception:
+            return None
+
+
+def build_session_rows(user_id, timetable: dict, subjects_meta: list):
+    """
+    Flatten a generated timetable into session_history parameter dicts, one
+    per (day, subject) slot. Subject metadata and deadlines are parsed once.
+    """
+    meta_by_name = {}
+    for s in subjects_meta:
+        name = str(s.get("name","")).strip()
+        if not name:
+            continue
+        meta_by_name[name] = (
+            int(s.get("difficulty") or 3),
+            int(s.get("importance") or 3),
+            float(s.get("syllabus_size") or 1.0),
+            _parse_date(s.get("deadline")),
+            s.get("task_type") or "Other"
+        )
+
+    missing = (None, None, None, None, None)
+    now = datetime.utcnow()
+    rows = []
+    for date_str, slots in timetable.items():
+        day_date = _parse_date(date_str)
+        for slot in slots:
+            hours = float(slot.get("hours", 0.0) or 0.0)
+            if hours <= 0:
+                continue
+            subj_name = slot.get("subject")
+            difficulty, importance, syllabus_size, deadline, task_type = meta_by_name.get(subj_name, missing)
+            days_to_deadline = None
+            if deadline and day_date:
+                days_to_deadline = max(0, (deadline - day_date).days)
+            rows.append({
+                "user_id": user_id,
+                "subject": subj_name,
+                "actual_hours": hours,
+                "difficulty": difficulty,
+                "importance": importance,
+                "syllabus_size": syllabus_size,
+                "days_to_deadline": days_to_deadline,
+                "task_type": task_type,
+                "source": "generated",
+                "created_at": now
+            })
+    return rows
+
+
+def insert_session_rows(rows):
+    """Insert prepared rows with a single Core executemany and commit."""
+    if not rows:
+        return 0
+    with span("session_insert"):
+        db.session.execute(SessionHistory.__table__.insert(), rows)
+        db.session.commit()
+    _session_rows.inc(len(rows))
+    return len(rows)
+
+
+class SessionWriter:
+    """
+    Background thread that records generated timetables as session rows so
+    the HTTP response does not wait on the insert. Everything queued while a
+    write is in progress goes into the next transaction together.
+    `on_written(user_ids)` is called after each successful commit.
+    """
+
+    def __init__(self, app, on_written=None, max_batch=64):
+        self.app = app
+        self.on_written = on_written
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.written_rows = 0
+        self.transactions = 0
+        self.failures = 0
+
+    def submit(self, user_id, timetable: dict, subjects_meta: list):
+        self._queue.put((user_id, timetable, subjects_meta))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="session-writer", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """Block until everything submitted so far has been written."""
+        self._queue.join()
+
+    def _loop(self):
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < self.max_batch:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(jobs)
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+
+    def _write(self, jobs):
+        with self.app.app_context():
+            try:
+                with span("session_record", path="writer"):
+                    rows = []
+                    for user_id, timetable, subjects_meta in jobs:
+                        rows.extend(build_session_rows(user_id, timetable, subjects_meta))
+                    n = insert_session_rows(rows)
+                self.written_rows += n
+                self.transactions += 1
+            except Exception as e:
+                db.session.rollback()
+                self.failures += 1
+                self.app.logger.error("Failed to record generated timetable sessions: %s", e)
+                self.app.logger.error(traceback.format_exc())
+                return
+        self.app.logger.info("AutoML: recorded %s generated session rows", n)
+        if self.on_written:
+            self.on_written({user_id for user_id, _, _ in jobs})
+
+    def status(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written_rows": self.written_rows,
+            "transactions": self.transactions,
+            "failures": self.failures,
+        }
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+
+def cache_key(**inputs) -> str:
+    """Canonical SHA-256 of the inputs, independent of dict key order."""
+    blob = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class TimetableCache:
+    """
+    Bounded LRU + TTL cache for deterministic create_timetable results.
+    Keys already include the model version and date; entries are also
+    dropped wholesale when the calendar day changes.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._day = date.today()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _roll_day(self):
+        today = date.today()
+        if today != self._day:
+            self._entries.clear()
+            self._day = today
+
+    def get(self, key):
+        with self._lock:
+            self._roll_day()
+            item = self._entries.get(key)
+            if item is not None and item[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._roll_day()
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+timetable_cache = TimetableCache(
+    max_entries=int(os.environ.get("TIMETABLE_CACHE_SIZE", 256)),
+    ttl_seconds=float(os.environ.get("TIMETABLE_CACHE_TTL", 600))
+)
@@ -0,0 +1,134 @@
+import base64
+import os
+import zlib
+from datetime import date, timedelta
+import numpy as np
+
+PACKED_FORMAT = "packed-v1"
+TIMETABLE_STORAGE = os.environ.get("TIMETABLE_STORAGE", "packed")
+
+_PLAIN_KEYS = {"subject", "hours"}
+_SLOT_KEYS = {"subject", "hours", "start", "end"}
+
+
+def _clock_minutes(value):
+    hours, minutes = str(value).split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def encode_timetable(timetable: dict, compress: bool = True):
+    """
+    Pack a {date: [{subject, hours}]} timetable into a small JSON-safe dict.
+    The dict holds a subject name table plus little-endian arrays: date
+    offsets, entries per day, subject index and hundredths of an hour per
+    entry, and start/end minutes for slot timetables. The arrays are
+    zlib-compressed and base64-encoded. Timetables that don't fit this shape
+    (extra keys, odd dates, hours finer than 0.01) are returned unchanged.
+    """
+    if not isinstance(timetable, dict) or not timetable or timetable.get("_fmt"):
+        return timetable
+    try:
+        days = [date.fromisoformat(d) for d in timetable]
+    except (TypeError, ValueError):
+        return timetable
+
+    if not all(isinstance(slots, list) and all(isinstance(slot, dict) for slot in slots)
+               for slots in timetable.values()):
+        return timetable
+    entries = [slot for slots in timetable.values() for slot in slots]
+    key_sets = {frozenset(slot) for slot in entries}
+    if not entries:
+        return timetable
+    if key_sets - {frozenset(_PLAIN_KEYS), frozenset(_SLOT_KEYS)} or len(key_sets) > 1:
+        return timetable
+    with_clock = key_sets == {frozenset(_SLOT_KEYS)}
+
+    start = min(days)
+    subjects, subject_index = [], {}
+    subj = np.empty(len(entries), dtype="<u2")
+    centi = np.empty(len(entries), dtype="<u4")
+    clock = np.empty((len(entries), 2), dtype="<u2") if with_clock else None
+    try:
+        for k, slot in enumerate(entries):
+            name = slot["subject"]
+            if name not in subject_index:
+                subject_index[name] = len(subjects)
+                subjects.append(name)
+            hours = float(slot["hours"])
+            value = int(round(hours * 100))
+            if value < 0 or value / 100 != hours:
+                return timetable
+            subj[k] = subject_index[name]
+            centi[k] = value
+            if with_clock:
+                clock[k] = (_clock_minutes(slot["start"]), _clock_minutes(slot["end"]))
+    except (TypeError, ValueError, OverflowError):
+        return timetable
+    if len(subjects) > 0xFFFF:
+        return timetable
+
+    offsets = np.array([(d - start).days for d in days], dtype="<u4")
+    counts = np.array([len(slots) for slots in timetable.values()], dtype="<u2")
+    parts = [offsets, counts, subj, centi] + ([clock] if with_clock else [])
+    blob = b"".join(p.tobytes() for p in parts)
+    if compress:
+        blob = zlib.compress(blob, 6)
+    return {
+        "_fmt": PACKED_FORMAT,
+        "start": start.isoformat(),
+        "days": len(days),
+        "entries": len(entries),
+        "subjects": subjects,
+        "clock": with_clock,
+        "zlib": compress,
+        "blob": base64.b64encode(blob).decode("ascii"),
+    }
+
+
+def decode_timetable(data):
+    """
+    Inverse of encode_timetable. Plain JSON timetables pass through unchanged.
+    """
+    if not isinstance(data, dict) or data.get("_fmt") != PACKED_FORMAT:
+        return data
+    blob = base64.b64decode(data["blob"])
+    if data.get("zlib"):
+        blob = zlib.decompress(blob)
+
+    n_days, n_entries = data["days"], data["entries"]
+    pos = 0
+
+    def take(dtype, count):
+        nonlocal pos
+        arr = np.frombuffer(blob, dtype=dtype, count=count, offset=pos)
+        pos += arr.nbytes
+        return arr
+
+    offsets = take("<u4", n_days).tolist()
+    counts = take("<u2", n_days).tolist()
+    subj = take("<u2", n_entries).tolist()
+    hours = (take("<u4", n_entries) / 100).tolist()
+    clock = take("<u2", 2 * n_entries).reshape(-1, 2).tolist() if data.get("clock") else None
+
+    names = data["subjects"]
+    start = date.fromisoformat(data["start"])
+    timetable, k = {}, 0
+    for offset, count in zip(offsets, counts):
+        day_list = []
+        for _ in range(count):
+            slot = {"subject": names[subj[k]], "hours": hours[k]}
+            if clock is not None:
+                a, b = clock[k]
+                slot["start"] = f"{a // 60:02d}:{a % 60:02d}"
+                slot["end"] = f"{b // 60:02d}:{b % 60:02d}"
+            day_list.append(slot)
+            k += 1
+        timetable[(start + timedelta(days=offset)).isoformat()] = day_list
+    return timetable
+
+
+def pack_for_storage(timetable):
+    """Encode according to TIMETABLE_STORAGE ("packed" or "json")."""
+    if TIMETABLE_STORAGE == "json":
+        return timetable
+    return encode_timetable(timetable)
@@ -1,29 +1,172 @@
 import os
+import sys
+import time
+from datetime import datetime, timedelta
 import joblib
+import numpy as np
 import pandas as pd
+from sqlalchemy import select, func
 from sklearn.ensemble import RandomForestRegressor
-from models import SessionHistory
+from models import db, SessionHistory, SessionRollup
+from model_registry import MODEL_PATH, save_artifact, user_model_path
+from flat_forest import FlatForest, file_sha256, flat_path
+from metrics import span
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "ml_model.joblib")
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
-def load_session_dataframe(app):
+N_ESTIMATORS = 100
+INCREMENTAL_TREES = 10
+MAX_TREES = 200
+# Incremental runs only ever see new rows, so the forest is refitted on
+# everything after this many of them or this long after the last full fit
+# (0 turns either limit off).
+FULL_RETRAIN_EVERY = int(os.environ.get("FULL_RETRAIN_EVERY", 20))
+FULL_RETRAIN_HOURS = float(os.environ.get("FULL_RETRAIN_HOURS", 24))
+LOAD_CHUNK_SIZE = 10_000
+MIN_USER_ROWS = 200
+
+last_load_stats = {}
+
+def load_session_dataframe(app, since_id=None, user_id=None, chunk_size=LOAD_CHUNK_SIZE):
+    """
+    Stream the training columns of session_history into typed NumPy arrays,
+    reading `chunk_size` rows at a time instead of materialising ORM objects.
+    Throughput and peak RSS of the last call are kept in `last_load_stats`.
+    """
+    started = time.perf_counter()
     with app.app_context():
-        sessions = SessionHistory.query.all()
-        rows = []
-        for s in sessions:
-            rows.append({
-                "subject": s.subject,
-                "actual_hours": s.actual_hours,
-                "difficulty": s.difficulty or 3,
-                "importance": s.importance or 3,
-                "syllabus_size": s.syllabus_size or 1.0,
-                "days_to_deadline": s.days_to_deadline if s.days_to_deadline is not None else 30,
-                "task_type": s.task_type or "Other"
-            })
-        if not rows:
+        where = []
+        if since_id is not None:
+            where.append(SessionHistory.id > since_id)
+        if user_id is not None:
+            where.append(SessionHistory.user_id == user_id)
+        total = db.session.execute(select(func.count(SessionHistory.id)).where(*where)).scalar() or 0
+        if not total:
             return pd.DataFrame()
-        df = pd.DataFrame(rows)
+
+        ids = np.empty(total, dtype=np.int64)
+        hours = np.empty(total, dtype=np.float64)
+        difficulty = np.empty(total, dtype=np.float64)
+        importance = np.empty(total, dtype=np.float64)
+        syllabus = np.empty(total, dtype=np.float64)
+        days = np.empty(total, dtype=np.float64)
+        task_codes = np.empty(total, dtype=np.int32)
+        task_index = {}
+
+        stmt = select(
+            SessionHistory.id,
+            SessionHistory.actual_hours,
+            SessionHistory.difficulty,
+            SessionHistory.importance,
+            SessionHistory.syllabus_size,
+            SessionHistory.days_to_deadline,
+            SessionHistory.task_type,
+        ).where(*where).order_by(SessionHistory.id).execution_options(yield_per=chunk_size)
+
+        pos = 0
+        result = db.session.execute(stmt)
+        for chunk in result.partitions():
+            n = min(len(chunk), total - pos)
+            if n <= 0:
+                break
+            cols = list(zip(*chunk[:n]))
+            end = pos + n
+            ids[pos:end] = cols[0]
+            hours[pos:end] = cols[1]
+            difficulty[pos:end] = np.array(cols[2], dtype=np.float64)
+            importance[pos:end] = np.array(cols[3], dtype=np.float64)
+            syllabus[pos:end] = np.array(cols[4], dtype=np.float64)
+            days[pos:end] = np.array(cols[5], dtype=np.float64)
+            task_codes[pos:end] = [task_index.setdefault(t or "Other", len(task_index)) for t in cols[6]]
+            pos = end
+        result.close()
+
+    n = pos
+    # Match the ORM loader's defaults: falsy values fall back, 0 days is kept.
+    for arr, default in ((difficulty, 3), (importance, 3), (syllabus, 1.0)):
+        arr[np.isnan(arr) | (arr == 0)] = default
+    days[np.isnan(days)] = 30
+
+    categories = sorted(task_index)
+    remap = np.empty(len(task_index), dtype=np.int32)
+    for name, code in task_index.items():
+        remap[code] = categories.index(name)
+
+    df = pd.DataFrame({
+        "id": ids[:n],
+        "actual_hours": hours[:n],
+        "difficulty": difficulty[:n].astype(np.int64),
+        "importance": importance[:n].astype(np.int64),
+        "syllabus_size": syllabus[:n],
+        "days_to_deadline": days[:n].astype(np.int64),
+        "task_type": pd.Categorical.from_codes(remap[task_codes[:n]], categories),
+    })
+
+    elapsed = time.perf_counter() - started
+    last_load_stats.update({
+        "rows": n,
+        "seconds": elapsed,
+        "rows_per_sec": n / elapsed if elapsed > 0 else None,
+        "array_bytes": int(df.memory_usage(deep=False).sum()),
+        "peak_rss_mb": _peak_rss_mb(),
+    })
+    app.logger.info("Loaded %d session rows in %.2fs (%.0f rows/s)", n, elapsed, last_load_stats["rows_per_sec"] or 0)
+    return df
+
+def load_rollup_dataframe(app, user_id=None):
+    """
+    session_rollup (only `user_id`'s rows when given) as weighted training
+    samples: groups with the same model inputs are merged across users and
+    sources, with their mean hours as the target and their session count as
+    the "weight" column. "id" is the newest session folded into each sample.
+    """
+    keys = (SessionRollup.difficulty, SessionRollup.importance, SessionRollup.syllabus_size,
+            SessionRollup.days_to_deadline, SessionRollup.task_type)
+    stmt = select(
+        *keys,
+        func.sum(SessionRollup.session_count),
+        func.sum(SessionRollup.mean_hours * SessionRollup.session_count),
+        func.max(SessionRollup.max_session_id),
+    ).group_by(*keys)
+    if user_id is not None:
+        stmt = stmt.where(SessionRollup.user_id == user_id)
+    with app.app_context():
+        rows = db.session.execute(stmt).all()
+    if not rows:
+        return pd.DataFrame()
+
+    cols = list(zip(*rows))
+    weight = np.array(cols[5], dtype=np.float64)
+    return pd.DataFrame({
+        "id": np.array(cols[7], dtype=np.int64),
+        "actual_hours": np.array(cols[6], dtype=np.float64) / weight,
+        "difficulty": np.array(cols[0], dtype=np.int64),
+        "importance": np.array(cols[1], dtype=np.int64),
+        "syllabus_size": np.array(cols[2], dtype=np.float64),
+        "days_to_deadline": np.array(cols[3], dtype=np.int64),
+        "task_type": pd.Categorical(cols[4]),
+        "weight": weight,
+    })
+
+def _with_rollups(df, rollup):
+    """Raw rows (weight 1) followed by roll-up samples, with one task_type category set."""
+    if rollup.empty:
         return df
+    if df.empty:
+        return rollup
+    df = pd.concat([df.assign(weight=1.0), rollup], ignore_index=True)
+    df["task_type"] = pd.Categorical(df["task_type"].astype(object))
+    return df
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
 
 def featurize(df):
     df = df.copy()
@@ -35,17 +178,137 @@ def featurize(df):
     y = df["actual_hours"]
     return X, y
 
-def train_and_save(app):
-    df = load_session_dataframe(app)
+def _fit_full(X, y, sample_weight=None):
+    model = RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=42)
+    model.fit(X, y, sample_weight=sample_weight)
+    return model
+
+def _fit_incremental(model, X, y):
+    """
+    Grow `model` by INCREMENTAL_TREES trees fitted on the new rows only, then
+    retire the oldest trees so the forest never exceeds MAX_TREES.
+    """
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + INCREMENTAL_TREES)
+    model.fit(X, y)
+    if len(model.estimators_) > MAX_TREES:
+        model.estimators_ = model.estimators_[-MAX_TREES:]
+        model.n_estimators = MAX_TREES
+    return model
+
+def _load_payload(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        return joblib.load(path)
+    except Exception:
+        return None
+
+def train_and_save(app, incremental=False, user_id=None):
+    """
+    Train the model and write it to MODEL_PATH, or to the user's own artifact
+    when `user_id` is given. A user model is only trained once that user has
+    MIN_USER_ROWS sessions; until then None is returned and the scheduler
+    keeps using the global model. A full retrain also fits on session_rollup,
+    each roll-up sample weighted by the sessions it stands for.
+    With `incremental=True` only rows newer than the saved watermark are read
+    and added to the existing forest as extra trees. A full retrain is done
+    instead when there is no usable model yet, FULL_RETRAIN_EVERY incremental
+    runs or FULL_RETRAIN_HOURS have passed since the last one, or the new
+    rows bring task types the model has never seen. The train span is
+    labelled with the mode that actually ran.
+    """
+    path = MODEL_PATH if user_id is None else user_model_path(user_id)
+    scope = "global" if user_id is None else "user"
+    payload = _load_payload(path) if incremental else None
+    if _can_grow(payload):
+        with span("train", mode="incremental", scope=scope):
+            grown = _train_incremental(app, path, payload, user_id)
+        if grown is not None:
+            return grown
+    with span("train", mode="full", scope=scope):
+        return _train_full(app, path, user_id)
+
+
+def _can_grow(payload):
+    """Whether the saved payload can take an incremental run rather than a full refit."""
+    if not payload or payload.get("model") is None or payload.get("watermark") is None:
+        return False
+    if FULL_RETRAIN_EVERY > 0 and payload.get("incremental_runs", 0) >= FULL_RETRAIN_EVERY:
+        return False
+    full_at = payload.get("full_trained_at")
+    if FULL_RETRAIN_HOURS > 0 and full_at:
+        return datetime.utcnow() - datetime.fromisoformat(full_at) < timedelta(hours=FULL_RETRAIN_HOURS)
+    return True
+
+
+def _train_incremental(app, path, payload, user_id):
+    """Grow the saved forest on rows past its watermark; None when a full retrain is needed."""
+    watermark = payload["watermark"]
+    df = load_session_dataframe(app, since_id=watermark, user_id=user_id)
+    if df.empty:
+        return path
+    X, y = featurize(df)
+    columns = payload["columns"]
+    if not set(X.columns) <= set(columns):
+        return None
+    model = _fit_incremental(payload["model"], X.reindex(columns=columns, fill_value=0), y)
+    return _save(path, model, columns, max(watermark, int(df["id"].max())), "incremental", payload)
+
+
+def _train_full(app, path, user_id):
+    df = _with_rollups(load_session_dataframe(app, user_id=user_id), load_rollup_dataframe(app, user_id))
+    weight = df["weight"].to_numpy() if "weight" in df else None
+    sessions = len(df) if weight is None else weight.sum()
+    if user_id is not None and sessions < MIN_USER_ROWS:
+        return None
     if df.empty:
         raise RuntimeError("No session history available for training.")
 
     X, y = featurize(df)
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
+    model = _fit_full(X, y, sample_weight=weight)
+    return _save(path, model, X.columns.tolist(), int(df["id"].max()), "full")
 
-    joblib.dump({
+def _save(path, model, columns, watermark, mode, previous=None):
+    """`previous` is the payload an incremental run grew, whose full-fit bookkeeping carries over."""
+    trained_at = datetime.utcnow().isoformat()
+    incremental = mode == "incremental" and previous is not None
+    payload = {
         "model": model,
-        "columns": X.columns.tolist()
-    }, MODEL_PATH)
-    return MODEL_PATH
+        "columns": columns,
+        "watermark": watermark,
+        "mode": mode,
+        "incremental_runs": previous.get("incremental_runs", 0) + 1 if incremental else 0,
+        "full_trained_at": previous.get("full_trained_at") if incremental else trained_at,
+        "version": int(time.time() * 1000),
+        "trained_at": trained_at
+    }
+    save_artifact(payload, path)
+    # Exported after the .joblib is in place so it can record that file's hash.
+    _export_flat(payload, path)
+    return path
+
+
+def _export_flat(payload, path):
+    flat = FlatForest.from_sklearn(payload.get("model"))
+    if flat is None:
+        return None
+    return flat.save(flat_path(path), payload.get("columns", []), version=payload.get("version"),
+                     trained_at=payload.get("trained_at"), source_sha256=file_sha256(path))
+
+
+def export_flat_forest(path=MODEL_PATH):
+    """Write the .npz flattened forest for an existing .joblib artifact."""
+    payload = _load_payload(path)
+    if not payload:
+        raise RuntimeError(f"No model payload at {path}")
+    return _export_flat(payload, path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Model artifact maintenance.")
+    parser.add_argument("--export-flat", nargs="?", const=MODEL_PATH, metavar="PATH",
+                        help="write the flattened .npz forest for a .joblib artifact")
+    args = parser.parse_args()
+    if args.export_flat:
+        print(export_flat_forest(args.export_flat))
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+from process_pool import SpawnPool
+
+# Train in a child process so sklearn and pandas (~150 MB, ~2 s to import)
+# never load into the web workers; they only read the flattened forest.
+TRAINING_PROCESS = os.environ.get("TRAINING_PROCESS", "1") != "0"
+
+_pool = SpawnPool(1)
+_job_app = None
+
+
+def _train_job(config, incremental, user_id):
+    """Runs in the training process against its own minimal Flask app."""
+    global _job_app
+    from flask import Flask
+    from models import db
+    from train_model import train_and_save
+    if _job_app is None:
+        _job_app = Flask(__name__)
+        _job_app.config.update(config)
+        db.init_app(_job_app)
+    return train_and_save(_job_app, incremental=incremental, user_id=user_id)
+
+
+def train_in_process(app, incremental=False, user_id=None):
+    from train_model import train_and_save
+    return train_and_save(app, incremental=incremental, user_id=user_id)
+
+
+def train_in_subprocess(app, incremental=False, user_id=None):
+    """train_and_save in the training process; blocks until it finishes."""
+    with app.app_context():
+        from models import db
+        config = {
+            "SQLALCHEMY_DATABASE_URI": db.engine.url.render_as_string(hide_password=False),
+            "SQLALCHEMY_ENGINE_OPTIONS": app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+        }
+    # No retry: a crash mid-training is reported, and the next request trains again.
+    return _pool.run(lambda executor: executor.submit(_train_job, config, incremental, user_id).result(),
+                     retries=0)
+
+
+def run_training(app, incremental=False, user_id=None):
+    if TRAINING_PROCESS:
+        return train_in_subprocess(app, incremental=incremental, user_id=user_id)
+    return train_in_process(app, incremental=incremental, user_id=user_id)
+
+
+class TrainingWorker:
+    """
+    Background thread that retrains models off the request path.
+    Requests are debounced: training starts once no new request has arrived
+    for `debounce_seconds`, or `max_wait_seconds` after the first request
+    still pending so a steady stream of requests cannot hold it off (0 means
+    no cap), and every request queued by then shares that run. Requests are
+    keyed by user, so each pass retrains the global model plus every user
+    model that was asked for, once. `clock` is the monotonic time source.
+    """
+
+    def __init__(self, app, debounce_seconds=5.0, train_fn=None, max_wait_seconds=60.0, clock=time.monotonic):
+        self.app = app
+        self.debounce_seconds = float(debounce_seconds)
+        self.max_wait_seconds = float(max_wait_seconds)
+        self.train_fn = train_fn or (lambda a, user_id: run_training(a, user_id=user_id))
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._thread = None
+        self._queued = 0
+        self._pending = set()
+        self._first_request = 0.0
+        self._last_request = 0.0
+        self._running = False
+        self.runs = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.last_started_at = None
+        self.last_finished_at = None
+        self.last_duration = None
+        self.last_error = None
+
+    def request(self, user_id=None):
+        """Queue a retrain of the global model (and `user_id`'s) and return immediately."""
+        with self._cond:
+            now = self.clock()
+            if self._queued == 0:
+                self._first_request = now
+            self._queued += 1
+            self._pending.add(None)
+            if user_id is not None:
+                self._pending.add(user_id)
+            self._last_request = now
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="training-worker", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._queued == 0:
+                    self._cond.wait()
+                while True:
+                    remaining = self._due() - self.clock()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queued
+                keys = sorted(self._pending, key=lambda k: (k is not None, k or 0))
+                self._queued = 0
+                self._pending = set()
+                self._running = True
+                self.last_started_at = datetime.utcnow()
+
+            started = time.perf_counter()
+            try:
+                for user_id in keys:
+                    self._train(user_id, batch)
+            finally:
+                with self._cond:
+                    self._running = False
+                    self.runs += 1
+                    self.coalesced += batch - 1
+                    self.last_duration = time.perf_counter() - started
+                    self.last_finished_at = datetime.utcnow()
+
+    def _due(self):
+        """When the pending batch should train: debounced, but never later than the cap allows."""
+        due = self._last_request + self.debounce_seconds
+        if self.max_wait_seconds > 0:
+            due = min(due, self._first_request + self.max_wait_seconds)
+        return due
+
+    def _train(self, user_id, batch):
+        label = "global" if user_id is None else f"user {user_id}"
+        try:
+            path = self.train_fn(self.app, user_id)
+            if path is None:
+                self.app.logger.info("AutoML: %s has too little history, using the global model", label)
+            else:
+                self.app.logger.info("AutoML: trained %s model at %s (%s coalesced requests)", label, path, batch)
+            self.last_error = None
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self.app.logger.error("AutoML: training %s model failed: %s", label, e)
+            self.app.logger.error(traceback.format_exc())
+
+    def status(self):
+        with self._cond:
+            return {
+                "queued": self._queued,
+                "pending_users": sorted(k for k in self._pending if k is not None),
+                "running": self._running,
+                "runs": self.runs,
+                "failures": self.failures,
+                "coalesced": self.coalesced,
+                "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+                "last_finished_at": self.last_finished_at.isoformat() if self.last_finished_at else None,
+                "last_duration": self.last_duration,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,79 @@
+import os
+from functools import partial
+from scheduler import create_timetable, _to_date
+from model_registry import registry
+from process_pool import SpawnPool
+
+MAX_VARIANTS = int(os.environ.get("MAX_VARIANTS", 16))
+VARIANT_POOL_WORKERS = int(os.environ.get("VARIANT_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def _init_worker():
+    # Load the global model once per worker; per-user models are then cached
+    # by the worker's own registry on first use.
+    registry.get()
+
+
+_pool = SpawnPool(VARIANT_POOL_WORKERS, initializer=_init_worker)
+
+
+def _run_variant(kwargs, variant):
+    return variant, create_timetable(variant=variant, **kwargs)
+
+
+def _run_all(kwargs, variants, executor):
+    futures = [executor.submit(_run_variant, kwargs, v) for v in variants]
+    return [future.result() for future in futures]
+
+
+def score_timetable(timetable, subjects):
+    """
+    Cheap quality score for ranking alternatives, in [0, 1]:
+    coverage is the share of study hours that fall on or before the subject's
+    deadline, balance is 1 - coefficient of variation of hours per study day.
+    """
+    deadlines = {str(s.get("name", "")).strip(): _to_date(s.get("deadline")) for s in subjects}
+    total = before = 0.0
+    day_totals = []
+    for date_str, slots in timetable.items():
+        day = _to_date(date_str)
+        hours_today = 0.0
+        for slot in slots:
+            hours = float(slot.get("hours", 0.0) or 0.0)
+            hours_today += hours
+            total += hours
+            deadline = deadlines.get(slot.get("subject"))
+            if deadline is None or day is None or day <= deadline:
+                before += hours
+        if hours_today > 0:
+            day_totals.append(hours_today)
+
+    coverage = before / total if total > 0 else 0.0
+    if day_totals:
+        mean = sum(day_totals) / len(day_totals)
+        var = sum((h - mean) ** 2 for h in day_totals) / len(day_totals)
+        balance = max(0.0, 1.0 - (var ** 0.5) / mean)
+    else:
+        balance = 0.0
+    return {
+        "score": round(0.7 * coverage + 0.3 * balance, 4),
+        "coverage": round(coverage, 4),
+        "balance": round(balance, 4),
+    }
+
+
+def generate_variants(kwargs, variants):
+    """
+    Run create_timetable(**kwargs) for every variant seed on the process pool
+    and return the alternatives ranked best first. If a worker dies the pool
+    is replaced and the batch retried once; BrokenProcessPool is raised when
+    the retry fails too.
+    """
+    results = _pool.run(partial(_run_all, kwargs, variants))
+    ranked = []
+    for variant, timetable in results:
+        item = {"variant": variant, "timetable": timetable}
+        item.update(score_timetable(timetable, kwargs["subjects"]))
+        ranked.append(item)
+    ranked.sort(key=lambda x: x["score"], reverse=True)
+    return ranked
@@ -1,3 +1,20 @@
+"""
+Production entry point. Serves asgi.application under uvicorn; WSGI servers
+can still import app from here (e.g. gunicorn wsgi:app). uvicorn starts each
+worker from scratch; gunicorn.conf.py pre-forks workers that share the model.
+
+    python wsgi.py            # HOST, PORT, WEB_WORKERS from the environment
+    gunicorn -c gunicorn.conf.py
+"""
+import os
 from app import app
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    import uvicorn
+    uvicorn.run(
+        "asgi:application",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", 5000)),
+        workers=int(os.environ.get("WEB_WORKERS", 1)),
+        proxy_headers=True
+    )
@@ -16,8 +16,12 @@ document.addEventListener("DOMContentLoaded", () => {
 
   let chart = null;
 
-  function setLatestTimetable(tt) {
+  function setLatestTimetable(tt, savedId = null, rescheduleVariant = null) {
     window.latestTimetable = tt;
+    // Id of the saved plan this timetable is (or reschedules), so Reschedule can replan it incrementally.
+    window.savedTimetableId = savedId;
+    // Variant of a reschedule of that plan not stored yet: Save writes it over the saved plan.
+    window.rescheduleVariant = rescheduleVariant;
   }
 
   function createSubjectRow(data = {}) {
@@ -73,28 +77,70 @@ document.addEventListener("DOMContentLoaded", () => {
     return subjects;
   }
 
+  function renderDayBlock(date, slots) {
+    const block = document.createElement("div");
+    block.className = "day-block";
+    block.innerHTML = `<h4>${date}</h4>`;
+    const ul = document.createElement("ul");
+    if (slots.length === 0) {
+      ul.innerHTML = `<li style="color:#777;">Unavailable / No Study</li>`;
+    } else {
+      for (const slot of slots) {
+        const when = slot.start ? `${slot.start}–${slot.end} ` : "";
+        ul.innerHTML += `<li>${when}${slot.subject} — ${slot.hours} hr</li>`;
+      }
+    }
+
+    block.appendChild(ul);
+    return block;
+  }
+
   function renderTimetable(timetable) {
     timetableContainer.innerHTML = "";
-    const totals = {}; 
     for (const date of Object.keys(timetable).sort()) {
-      const block = document.createElement("div");
-      block.className = "day-block";
-      block.innerHTML = `<h4>${date}</h4>`;
-      const ul = document.createElement("ul");
-      if (timetable[date].length === 0) {
-        ul.innerHTML = `<li style="color:#777;">Unavailable / No Study</li>`;
-      } else {
-        for (const slot of timetable[date]) {
-          ul.innerHTML += `<li>${slot.subject} — ${slot.hours} hr</li>`;
-        }
+      timetableContainer.appendChild(renderDayBlock(date, timetable[date]));
+    }
+    renderSummary(timetable);
+  }
+
+  function renderSummary(timetable) {
+    renderChartFromTimetable(timetable);
+    renderCalendarHighlights(timetable);
+  }
+
+  // Reads an NDJSON /api/generate response, appending each day as it arrives.
+  // Resolves to the whole timetable, or null after alerting an error.
+  async function renderTimetableStream(res) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    const timetable = {};
+    let buffer = "";
+    let failed = null;
+    timetableContainer.innerHTML = "";
+
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      const msg = JSON.parse(line);
+      if (msg.error) { failed = msg.error; return; }
+      if (msg.date) {
+        timetable[msg.date] = msg.slots;
+        timetableContainer.appendChild(renderDayBlock(msg.date, msg.slots));
       }
+    };
 
-      block.appendChild(ul);
-      timetableContainer.appendChild(block);
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split("\n");
+      buffer = lines.pop();
+      lines.forEach(handleLine);
     }
+    handleLine(buffer + decoder.decode());
+    if (failed) { alert(failed); return null; }
     setLatestTimetable(timetable);
-    renderChartFromTimetable(timetable);
-    renderCalendarHighlights(timetable);
+    renderSummary(timetable);
+    return timetable;
   }
 
   function renderChartFromTimetable(timetable) {
@@ -211,23 +257,67 @@ document.addEventListener("DOMContentLoaded", () => {
     doc.save("timetable.pdf");
   }
 
+  function planOptions() {
+    const unavailable_dates = window.flatpickrInstance
+      ? window.flatpickrInstance.selectedDates.map(d =>
+          new Date(Date.UTC(d.getFullYear(), d.getMonth(), d.getDate())).toISOString().slice(0,10)
+        )
+      : [];
+    return {
+      daily_hours: parseFloat(dailyHoursInput.value) || 5,
+      schedule_type: document.querySelector('input[name="schedule-type"]:checked').value,
+      unavailable_dates,
+      limit_weekends: !!limitWeekendsCheckbox.checked
+    };
+  }
+
   async function saveTimetable() {
     if (!window.latestTimetable) { alert("Generate first"); return; }
+    // The planner form goes along so the saved plan can be rescheduled incrementally.
+    let form = {};
+    try { form = { subjects: collectSubjects(), ...planOptions() }; } catch (err) { form = {}; }
+    if (window.savedTimetableId && window.rescheduleVariant !== null) {
+      await saveReschedule(form);
+      return;
+    }
     const title = prompt("Title for timetable:", "My Timetable");
     try {
       const res = await fetch("/api/save_timetable", {
         method: "POST",
         headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({ title, timetable: window.latestTimetable })
+        body: JSON.stringify({ ...form, title, timetable: window.latestTimetable })
       });
       const j = await res.json();
-      if (j.status === "ok") alert("Saved (id="+j.timetable_id+")");
+      if (j.status === "ok") {
+        setLatestTimetable(window.latestTimetable, j.timetable_id);
+        alert("Saved (id="+j.timetable_id+")");
+      }
       else alert("Save failed");
     } catch (e) {
       alert("Save failed (are you logged in?)");
     }
   }
 
+  // Store a rescheduled saved plan in place, replanning it with the variant
+  // that was shown so the saved row keeps its checkpoints.
+  async function saveReschedule(form) {
+    try {
+      const res = await fetch("/api/reschedule", {
+        method: "POST",
+        headers: {"Content-Type":"application/json"},
+        body: JSON.stringify({ ...form, timetable_id: window.savedTimetableId,
+                               variant: window.rescheduleVariant, persist: true })
+      });
+      const data = await res.json();
+      if (data.error) { alert(data.error); return; }
+      setLatestTimetable(data.timetable, data.timetable_id);
+      renderTimetable(data.timetable);
+      alert("Saved (id="+data.timetable_id+")");
+    } catch (e) {
+      alert("Save failed (are you logged in?)");
+    }
+  }
+
   async function generate(variant=null) {
     let subjects;
     try { subjects = collectSubjects(); }
@@ -254,9 +344,13 @@ document.addEventListener("DOMContentLoaded", () => {
     try {
       const res = await fetch("/api/generate", {
         method:"POST",
-        headers: {"Content-Type":"application/json"},
-        body: JSON.stringify(payload)
+        headers: {"Content-Type":"application/json", "Accept":"application/x-ndjson"},
+        body: JSON.stringify({ ...payload, stream: true })
       });
+      if ((res.headers.get("Content-Type") || "").includes("application/x-ndjson")) {
+        await renderTimetableStream(res);
+        return;
+      }
       const data = await res.json();
       if (data.error) { alert(data.error); return; }
       setLatestTimetable(data.timetable);
@@ -269,23 +363,8 @@ document.addEventListener("DOMContentLoaded", () => {
   try { subjects = collectSubjects(); }
   catch (err) { alert(err.message); return; }
 
-  const unavailable_dates = window.flatpickrInstance
-    ? window.flatpickrInstance.selectedDates.map(d =>
-        new Date(Date.UTC(
-            d.getFullYear(),
-            d.getMonth(),
-            d.getDate()
-        )).toISOString().slice(0,10)
-      )
-    : [];
-
-  const payload = {
-    subjects,
-    daily_hours: parseFloat(dailyHoursInput.value) || 5,
-    schedule_type: document.querySelector('input[name="schedule-type"]:checked').value,
-    unavailable_dates,
-    limit_weekends: !!limitWeekendsCheckbox.checked
-  };
+  const payload = { subjects, ...planOptions() };
+  if (window.savedTimetableId) payload.timetable_id = window.savedTimetableId;
 
   try {
     const res = await fetch("/api/reschedule", {
@@ -301,6 +380,10 @@ document.addEventListener("DOMContentLoaded", () => {
       return;
     }
 
+    // A rescheduled saved plan is not stored until the user saves it; until
+    // then Reschedule keeps replanning the saved one.
+    if (data.timetable_id) setLatestTimetable(data.timetable, data.timetable_id, data.variant);
+    else setLatestTimetable(data.timetable);
     renderTimetable(data.timetable);
 
   } catch (err) {
@@ -312,6 +395,7 @@ document.addEventListener("DOMContentLoaded", () => {
   if (loaded) {
     const parsed = JSON.parse(loaded);
     if (parsed.timetable) {
+      setLatestTimetable(parsed.timetable);
       renderTimetable(parsed.timetable);
     }
     localStorage.removeItem("loaded_timetable");